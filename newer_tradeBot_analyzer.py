@@ -0,0 +1,63 @@
+import math
+import threading
+
+class MoveStats():
+	__slots__ = ("lastIdx", "avgUp", "avgDown", "upCount", "downCount")
+
+	def __init__(self, avgUp, avgDown, minSamples):
+		# Offline values count as minSamples candles, missing ones start from scratch
+		self.lastIdx = None
+		self.avgUp = avgUp
+		self.avgDown = avgDown
+		self.upCount = minSamples if math.isfinite(avgUp) and avgUp > 0 else 0
+		self.downCount = minSamples if math.isfinite(avgDown) and avgDown < 0 else 0
+
+class MoveAnalyzer():
+	# Online avgUp/avgDown: exponentially weighted mean of up and down candle moves,
+	# O(1) per closed candle and written straight into the live SymbolParams
+	def __init__(self, table, timeframe, halfLife=500, minSamples=50):
+		self.table = table
+		self.timeframe = timeframe
+		self.alpha = 1.0 - 0.5 ** (1.0 / halfLife)
+		self.minSamples = minSamples
+		self.stats = {}
+		self.lock = threading.Lock()
+
+	def reset(self, symbol):
+		# Fresh offline values, start over from them
+		with self.lock:
+			self.stats.pop(symbol, None)
+
+	def blend(self, mean, move, count):
+		# Plain mean until there are enough samples, then exponentially weighted
+		if count == 1:
+			return move
+		return mean + max(self.alpha, 1.0 / count) * (move - mean)
+
+	def onClose(self, symbol, timeframe, candleIdx, row):
+		if timeframe != self.timeframe:
+			return
+		params = self.table.get(symbol)
+		if params is None:
+			return
+
+		with self.lock:
+			stats = self.stats.get(symbol)
+			if stats is None:
+				stats = self.stats[symbol] = MoveStats(params.avgUp, params.avgDown, self.minSamples)
+			if stats.lastIdx is not None and candleIdx <= stats.lastIdx:
+				return # Seen before a reload
+			stats.lastIdx = candleIdx
+
+			move = float(row[3] / row[0]) - 1.0
+			if move > 0:
+				stats.upCount += 1
+				stats.avgUp = self.blend(stats.avgUp, move, stats.upCount)
+			elif move < 0:
+				stats.downCount += 1
+				stats.avgDown = self.blend(stats.avgDown, move, stats.downCount)
+
+			if stats.upCount >= self.minSamples:
+				params.avgUp = stats.avgUp
+			if stats.downCount >= self.minSamples:
+				params.avgDown = stats.avgDown
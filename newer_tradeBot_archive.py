@@ -0,0 +1,77 @@
+import os
+import glob
+import threading
+import numpy as np
+import pandas as pd
+
+# One append only file of fixed size records per symbol and timeframe, sorted by open time (ms)
+CANDLE_DTYPE = np.dtype([("time", "<i8"), ("open", "<f8"), ("high", "<f8"), ("low", "<f8"), ("close", "<f8"), ("volume", "<f8")])
+
+def openCandles(path, start=None, end=None):
+	# Zero copy view of [start, end) by open time, safe while the bot keeps appending
+	size = os.path.getsize(path) if os.path.exists(path) else 0
+	count = size // CANDLE_DTYPE.itemsize
+	if not count:
+		return np.zeros(0, dtype=CANDLE_DTYPE)
+
+	candles = np.memmap(path, dtype=CANDLE_DTYPE, mode="r", shape=(count,))
+	times = candles["time"]
+	first = 0 if start is None else int(np.searchsorted(times, start, side="left"))
+	last = count if end is None else int(np.searchsorted(times, end, side="left"))
+	return candles[first:last]
+
+class CandleArchive():
+	def __init__(self, root="candles"):
+		self.root = root
+		self.pending = {}
+		self.lastTimes = {}
+		self.lock = threading.Lock()
+
+	def path(self, symbol, timeframe):
+		return os.path.join(self.root, str(timeframe), symbol.replace("/", "_") + ".candles")
+
+	def symbols(self, timeframe):
+		names = glob.glob(os.path.join(self.root, str(timeframe), "*.candles"))
+		return sorted(os.path.basename(name)[:-len(".candles")].replace("_", "/") for name in names)
+
+	def lastTime(self, symbol, timeframe):
+		key = (symbol, timeframe)
+		if key not in self.lastTimes:
+			candles = openCandles(self.path(symbol, timeframe))
+			self.lastTimes[key] = int(candles["time"][-1]) if len(candles) else -1
+		return self.lastTimes[key]
+
+	def onClose(self, symbol, timeframe, candleIdx, row):
+		# CandleCache listener, records are only buffered here, see flush()
+		openTime = candleIdx * timeframe * 1000
+		with self.lock:
+			if openTime <= self.lastTime(symbol, timeframe):
+				return
+			self.lastTimes[(symbol, timeframe)] = openTime
+			self.pending.setdefault((symbol, timeframe), []).append((openTime,) + tuple(row))
+
+	def flush(self):
+		# One open/append per file with new candles, so thousands of symbols never hold thousands of fds
+		with self.lock:
+			pending, self.pending = self.pending, {}
+
+		for (symbol, timeframe), rows in pending.items():
+			path = self.path(symbol, timeframe)
+			os.makedirs(os.path.dirname(path), exist_ok=True)
+			with open(path, "ab") as f:
+				# Drop a record torn by a crash mid write
+				torn = f.tell() % CANDLE_DTYPE.itemsize
+				if torn:
+					f.truncate(f.tell() - torn)
+				f.write(np.array(rows, dtype=CANDLE_DTYPE).tobytes())
+
+	def read(self, symbol, timeframe, start=None, end=None):
+		return openCandles(self.path(symbol, timeframe), start, end)
+
+	def frame(self, symbol, timeframe, start=None, end=None):
+		# Candles frame indexed by open time, as used by the backtester (copies)
+		candles = self.read(symbol, timeframe, start, end)
+		return pd.DataFrame({col: candles[col] for col in CANDLE_DTYPE.names[1:]}, index=candles["time"])
+
+	def frames(self, symbols, timeframe, start=None, end=None):
+		return {symbol: self.frame(symbol, timeframe, start, end) for symbol in symbols}
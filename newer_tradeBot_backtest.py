@@ -0,0 +1,146 @@
+import numpy as np
+import pandas as pd
+
+from .newer_tradeBot_signals import isEntry, isExit, isStopLoss, ENTER_MULT, EXIT_MULT
+
+# Replays closed candles through the tradeLoop rules, one decision per candle close.
+# Symbols are evaluated together at each step: sells first, then buys in symbol
+# order while fiat lasts (the live loop interleaves them per symbol).
+
+def alignCandles(frames):
+	# {symbol: candles frame} -> symbols, opens, closes as (symbols x time), aligned on the frame index
+	symbols = list(frames)
+	opens = pd.concat({s: frames[s]["open"] for s in symbols}, axis=1).sort_index()
+	closes = pd.concat({s: frames[s]["close"] for s in symbols}, axis=1).sort_index()
+	return symbols, opens.to_numpy(dtype=float).T, closes.to_numpy(dtype=float).T
+
+def runLength(cont):
+	# Consecutive True values ending at each column, first column always breaks
+	idx = np.arange(cont.shape[1])
+	lastBreak = np.maximum.accumulate(np.where(cont, 0, idx), axis=1)
+	return idx - lastBreak
+
+def candleStatusSeries(opens, closes, window=50):
+	# getCandleStatus for a window ending at every column, without building the windows
+	cdlDir = np.where(closes > opens, 1, -1)
+
+	prevOpens = np.empty_like(opens)
+	prevOpens[:, 0] = np.nan
+	prevOpens[:, 1:] = opens[:, :-1]
+	first = np.zeros_like(opens, dtype=bool)
+	first[:, 0] = True
+
+	upRun = runLength(~(prevOpens >= opens) & ~first)
+	downRun = runLength(~(prevOpens <= opens) & ~first)
+	run = np.minimum(np.where(cdlDir > 0, upRun, downRun), window - 1)
+
+	cols = np.arange(opens.shape[1])[None, :] - run
+	return cdlDir, np.take_along_axis(opens, cols, axis=1), closes
+
+def forwardFill(values):
+	# Last known value along each row, 0 before the first one
+	idx = np.where(np.isnan(values), 0, np.arange(values.shape[1]))
+	np.maximum.accumulate(idx, axis=1, out=idx)
+	return np.nan_to_num(np.take_along_axis(values, idx, axis=1))
+
+def backtest(opens, closes, avgUp, avgDown, tradeFee, totalCost, sellLossMult,
+		enterMult=ENTER_MULT, exitMult=EXIT_MULT, baseAmount=1000.0, window=50, chunk=20000):
+	nSymbols, nCandles = opens.shape
+	avgUp = np.asarray(avgUp, dtype=float)
+	avgDown = np.asarray(avgDown, dtype=float)
+
+	# Entry price is NaN while flat, so exit rules are False there without masking
+	entry = np.full(nSymbols, np.nan)
+	amount = np.zeros(nSymbols)
+	fiat = float(baseAmount)
+	held = buys = sells = wins = 0
+	peak = fiat
+	maxDrawdown = 0.0
+	lastPrices = np.zeros(nSymbols)
+
+	# Chunks overlap by one window so the open search sees the same history
+	for start in range(0, nCandles, chunk):
+		lead = min(start, window - 1)
+		end = min(start + chunk, nCandles)
+		cdlDir, sOpen, sPrice = candleStatusSeries(opens[:, start-lead:end], closes[:, start-lead:end], window)
+		cdlDir, sOpen, sPrice = cdlDir[:, lead:], sOpen[:, lead:], sPrice[:, lead:]
+
+		entrySig = isEntry(cdlDir, sPrice / sOpen - 1.0, avgDown[:, None], enterMult)
+		anyEntry = entrySig.any(axis=0)
+
+		# Time major from here on, one contiguous row per step
+		filled = np.where(np.isnan(sPrice[:, :1]), lastPrices[:, None], sPrice[:, :1])
+		filled = forwardFill(np.concatenate([filled, sPrice[:, 1:]], axis=1)).T.copy()
+		lastPrices = filled[-1].copy()
+		dirs = cdlDir.T.copy()
+		prices = sPrice.T.copy()
+		entrySig = entrySig.T.copy()
+
+		for t in range(end - start):
+			if not held and not anyEntry[t]:
+				continue
+
+			price = prices[t]
+			sDir = dirs[t]
+			flat = np.isnan(entry)
+
+			# Exits
+			if held:
+				entryChange = price / entry - 1.0
+				exits = isExit(sDir, entryChange, avgUp, exitMult) | isStopLoss(sDir, entryChange, avgDown, sellLossMult)
+				if exits.any():
+					idx = np.flatnonzero(exits)
+					exitPrice = price[idx]
+					fiat += float(np.sum(amount[idx] * exitPrice / (1 + tradeFee)))
+					wins += int(np.count_nonzero(exitPrice > entry[idx] * (1 + tradeFee) ** 2))
+					sells += len(idx)
+					held -= len(idx)
+					entry[idx] = np.nan
+					amount[idx] = 0.0
+
+			# Entries, in symbol order while fiat lasts
+			if anyEntry[t]:
+				taken = np.flatnonzero(entrySig[t] & flat)[:int(fiat // totalCost)]
+				if len(taken):
+					entry[taken] = price[taken]
+					amount[taken] = totalCost / price[taken] / (1 + tradeFee)
+					fiat -= totalCost * len(taken)
+					buys += len(taken)
+					held += len(taken)
+
+			equity = fiat + float(amount.dot(filled[t])) if held else fiat
+			if equity > peak:
+				peak = equity
+			elif 1.0 - equity / peak > maxDrawdown:
+				maxDrawdown = 1.0 - equity / peak
+
+	finalEquity = fiat + float(amount.dot(lastPrices))
+	return {
+		"pnl": finalEquity - baseAmount,
+		"pnlPct": finalEquity / baseAmount - 1.0,
+		"finalEquity": finalEquity,
+		"fiat": fiat,
+		"trades": buys + sells,
+		"buys": buys,
+		"sells": sells,
+		"wins": wins,
+		"openPositions": held,
+		"maxDrawdown": maxDrawdown
+	}
+
+def backtestBot(bot, frames, **kwargs):
+	# Backtest with the bot's own symbol table, fee and config
+	table = bot.getSymbolTable()
+	symbols, opens, closes = alignCandles({s: frames[s] for s in table if s in frames})
+	params = dict(
+		tradeFee=bot.tradeFee,
+		totalCost=bot.gblConf("totalCost"),
+		sellLossMult=bot.gblConf("sellLossMult"),
+		enterMult=bot.enterMult,
+		exitMult=bot.exitMult
+	)
+	params.update(kwargs)
+
+	avgUp = [table[s].avgUp for s in symbols]
+	avgDown = [table[s].avgDown for s in symbols]
+	return backtest(opens, closes, avgUp, avgDown, **params)
@@ -0,0 +1,322 @@
+import os
+import sys
+import json
+import time
+import logging
+import argparse
+import platform
+import tempfile
+import tracemalloc
+import subprocess
+import numpy as np
+import pandas as pd
+
+from .newer_tradeBot_core import TradeBot
+from .newer_tradeBot_simulator import VirtualClock, SimExchange
+
+# In-process stand-ins for api.TradeApi, storage.Storage and discord.DiscordBot
+
+def syntheticCandles(symbol, timeframe, first, count):
+	# Deterministic per (symbol, candle index), so overlapping fetches agree
+	idx = np.arange(first, first + count, dtype=float)
+	phase = (sum(map(ord, symbol)) % 997) / 97.0
+	opens = 100.0 * (1.0 + 0.02 * np.sin(idx * 0.05 + phase) + 0.005 * np.sin(idx * 0.9 + phase * 3))
+	closes = opens * (1.0 + 0.003 * np.sin(idx * 1.7 + phase * 5))
+	return pd.DataFrame({
+		"time": (idx * timeframe * 1000).astype(np.int64),
+		"open": opens,
+		"high": np.maximum(opens, closes) * 1.001,
+		"low": np.minimum(opens, closes) * 0.999,
+		"close": closes,
+		"volume": 10.0 + 5.0 * np.abs(np.sin(idx * 0.3 + phase))
+	})
+
+class FakeTradeApi():
+	def __init__(self, latency=0.0, connectLatency=0.0, balances=None, clock=time):
+		self.latency = latency
+		self.connectLatency = connectLatency
+		self.balances = balances or {}
+		self.clock = clock
+		self.requests = 0
+		self.rows = 0
+
+	def binanceConnect(self):
+		time.sleep(self.connectLatency)
+		return True
+
+	def getCandles(self, symbol, timeframe, maxCandles):
+		if self.latency:
+			time.sleep(self.latency)
+		self.requests += 1
+		self.rows += maxCandles
+
+		tfSec = timeToSec(timeframe)
+		last = int(self.clock.time() // tfSec)
+		return syntheticCandles(symbol, tfSec, last - maxCandles + 1, maxCandles)
+
+	def getBalance(self):
+		time.sleep(self.connectLatency)
+		return {"free": dict(self.balances)}
+
+	def buy(self, symbol, amount):
+		return None
+
+	def sell(self, symbol, amount):
+		return None
+
+class FakeStorage():
+	def __init__(self, symbols, conf=None, fee=0.001):
+		self.conf = {"baseSymbol": "USDT", "longCandle": "1m", "shortCandle": "1m", "totalCost": 10.0, "sellLossMult": 2.0}
+		self.conf.update(conf or {})
+		self.fee = fee
+		self.symbols = pd.DataFrame({
+			"symbol": symbols,
+			"avgUp": np.linspace(0.002, 0.01, len(symbols)),
+			"avgDown": -np.linspace(0.002, 0.01, len(symbols))
+		})
+		self.obsolete = []
+		self.balances = {}
+		self.entries = {}
+
+	def gblConf(self, key):
+		return self.conf[key]
+
+	def getFee(self, exchange):
+		return self.fee
+
+	def loadSymbols(self, cache=False):
+		return self.symbols
+
+	def getObsoleteSymbols(self, cache=False):
+		return self.obsolete
+
+	def loadBalance(self):
+		pass
+
+	def saveBalance(self):
+		pass
+
+	def getBalances(self):
+		return self.balances
+
+	def resetBalance(self, symbolList):
+		self.balances = {symbol: 0.0 for symbol in symbolList}
+		self.entries = {}
+
+	def setBalance(self, symbol, value):
+		self.balances[symbol] = value
+
+	def addBalance(self, symbol, value):
+		self.balances[symbol] = self.balances.get(symbol, 0.0) + value
+
+	def getBalance(self, symbol):
+		return self.balances.get(symbol, 0.0)
+
+	def setEntry(self, symbol, value):
+		self.entries[symbol] = value
+
+	def getEntry(self, symbol):
+		return self.entries.get(symbol, 0.0)
+
+	def hasEntry(self, symbol):
+		return self.entries.get(symbol, 0.0) != 0.0
+
+	def getBalancesInfo(self):
+		return ["{}: {}".format(symbol, value) for symbol, value in self.balances.items()]
+
+class FakeDiscordBot():
+	def __init__(self, latency=0.0, keep=False):
+		self.latency = latency
+		self.sent = 0
+		self.messages = [] if keep else None
+
+	def notify(self, msg, icon=None):
+		if self.latency:
+			time.sleep(self.latency)
+		self.sent += 1
+		if self.messages is not None:
+			self.messages.append((icon, msg))
+
+def timeToSec(strTime):
+	suffixes = {"s": 1, "m": 60, "h": 3600, "d": 86400}
+	if strTime[-1] in suffixes:
+		return int(strTime[:-1]) * suffixes[strTime[-1]]
+	return int(strTime)
+
+def symbolNames(count):
+	return ["C{}/USDT".format(i) for i in range(count)]
+
+def makeBot(count, latency=0.0, journalDir=None, connectLatency=0.0, **kwargs):
+	journalDir = journalDir or tempfile.mkdtemp(prefix="tradeBench")
+	return TradeBot(
+		testMode=kwargs.pop("testMode", True),
+		resetBalance=kwargs.pop("resetBalance", True),
+		baseAmount=10.0 * count,
+		trader=FakeTradeApi(latency, connectLatency, {"USDT": 10.0 * count}, kwargs.get("clock", time)),
+		stor=FakeStorage(symbolNames(count)),
+		discordBot=FakeDiscordBot(),
+		journalPath=os.path.join(journalDir, "balance.journal"),
+		statePath=kwargs.pop("statePath", os.path.join(journalDir, "trader_state.npz")),
+		weightPerMinute=kwargs.pop("weightPerMinute", 10**9), # The fake exchange has no limits
+		**kwargs
+	)
+
+def benchCycles(count, cycles=5, latency=0.0):
+	bot = makeBot(count, latency)
+
+	# Cold cycle fills every candle window
+	start = time.perf_counter()
+	bot.tradeCycle()
+	cold = time.perf_counter() - start
+
+	times = []
+	for i in range(cycles):
+		start = time.perf_counter()
+		bot.tradeCycle()
+		times.append(time.perf_counter() - start)
+
+	# Memory on a separate pass, tracemalloc slows everything down
+	tracemalloc.start()
+	before = tracemalloc.take_snapshot()
+	tracemalloc.reset_peak()
+	bot.tradeCycle()
+	after = tracemalloc.take_snapshot()
+	current, peak = tracemalloc.get_traced_memory()
+	tracemalloc.stop()
+	stats = after.compare_to(before, "filename")
+
+	warm = float(np.median(times))
+	return {
+		"symbols": count,
+		"latency": latency,
+		"coldCycle": cold,
+		"cycle": warm,
+		"cycleMax": max(times),
+		"perSymbol": warm / count,
+		"allocBlocks": sum(max(stat.count_diff, 0) for stat in stats),
+		"allocBytes": sum(max(stat.size_diff, 0) for stat in stats),
+		"peakBytes": peak,
+		"requests": bot.trader.requests,
+		"rows": bot.trader.rows
+	}
+
+def benchStartup(count, latency=0.0, connectLatency=0.5):
+	# Live mode time to first decision, cold and then restored from the cold run's state.
+	# connectLatency stands in for the exchange login and balance requests.
+	journalDir = tempfile.mkdtemp(prefix="tradeBench")
+	statePath = os.path.join(journalDir, "state.npz")
+	result = {"symbols": count, "latency": latency}
+	for run in ("cold", "warm"):
+		bot = makeBot(count, latency, journalDir, connectLatency, testMode=False, statePath=statePath)
+		bot.tradeCycle()
+		bot.persistState(force=True)
+		bot.journal.close()
+		result[run + "Start"] = bot.firstDecision
+		result[run + "Rows"] = bot.trader.rows
+	return result
+
+def benchSoak(count, cycles=1000, **kwargs):
+	# Live mode against the simulated exchange, virtual time so cycles run back to back
+	clock = VirtualClock()
+	exchange = SimExchange(syntheticCandles, clock, {"USDT": 10.0 * count}, **kwargs)
+	bot = TradeBot(
+		trader=exchange,
+		stor=FakeStorage(symbolNames(count)),
+		discordBot=FakeDiscordBot(),
+		journalPath=os.path.join(tempfile.mkdtemp(prefix="tradeBench"), "balance.journal"),
+		weightPerMinute=10**9,
+		statePath=None,
+		clock=clock
+	)
+
+	start = time.perf_counter()
+	bot.tradeLoop(cycles)
+	elapsed = time.perf_counter() - start
+	return {
+		"symbols": count,
+		"cycles": cycles,
+		"cyclesPerSec": cycles / elapsed,
+		"orders": len(exchange.orders),
+		"fiat": exchange.balances.get("USDT", 0.0)
+	}
+
+def version():
+	try:
+		out = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, cwd=os.path.dirname(__file__))
+		return out.stdout.strip() or "unknown"
+	except OSError:
+		return "unknown"
+
+def runBench(sizes=(10, 100, 1000, 5000), cycles=5, latency=0.0, resultsPath="bench_results.jsonl"):
+	logging.disable(logging.INFO)
+	try:
+		results = [benchCycles(count, cycles, latency) for count in sizes]
+	finally:
+		logging.disable(logging.NOTSET)
+
+	run = {
+		"version": version(),
+		"time": time.time(),
+		"python": platform.python_version(),
+		"machine": platform.machine(),
+		"results": results
+	}
+	with open(resultsPath, "a") as f:
+		f.write(json.dumps(run) + "\n")
+	return run
+
+def compareRuns(old, new, tolerance=0.1):
+	# Regressions in warm cycle time per symbol count
+	oldResults = {r["symbols"]: r for r in old["results"]}
+	lines = []
+	for res in new["results"]:
+		prev = oldResults.get(res["symbols"])
+		if prev is None:
+			continue
+		change = res["cycle"] / prev["cycle"] - 1.0
+		flag = " REGRESSION" if change > tolerance else ""
+		lines.append("{:>6} symbols: {:.4f}s -> {:.4f}s ({:+.1%}){}".format(res["symbols"], prev["cycle"], res["cycle"], change, flag))
+	return lines
+
+def main(argv=None):
+	parser = argparse.ArgumentParser(description="TradeBot cycle benchmark")
+	parser.add_argument("--sizes", type=int, nargs="+", default=[10, 100, 1000, 5000])
+	parser.add_argument("--cycles", type=int, default=5)
+	parser.add_argument("--latency", type=float, default=0.0, help="Fake exchange latency per request (s)")
+	parser.add_argument("--results", default="bench_results.jsonl")
+	parser.add_argument("--startup", action="store_true", help="Time to first decision, cold vs warm start")
+	parser.add_argument("--connect-latency", type=float, default=0.5, help="Fake exchange login/balance latency for --startup (s)")
+	parser.add_argument("--soak", type=int, metavar="CYCLES", help="Run CYCLES live cycles against the simulated exchange")
+	args = parser.parse_args(argv)
+
+	if args.soak:
+		logging.disable(logging.WARNING)
+		for count in args.sizes:
+			print("{symbols:>6} symbols: {cycles} cycles at {cyclesPerSec:.1f} cycles/s, {orders} orders, "
+				"{fiat:.2f} USDT left".format(**benchSoak(count, args.soak)))
+		return
+
+	if args.startup:
+		logging.disable(logging.ERROR) # Live orders always fail against the fake exchange
+		for count in args.sizes:
+			print("{symbols:>6} symbols: first decision cold {coldStart:.4f}s ({coldRows} rows), "
+				"warm {warmStart:.4f}s ({warmRows} rows)".format(**benchStartup(count, args.latency, args.connect_latency)))
+		return
+
+	previous = None
+	if os.path.exists(args.results):
+		with open(args.results) as f:
+			lines = f.read().splitlines()
+		previous = json.loads(lines[-1]) if lines else None
+
+	run = runBench(args.sizes, args.cycles, args.latency, args.results)
+	for res in run["results"]:
+		print("{symbols:>6} symbols: cycle {cycle:.4f}s ({perSymbol:.2e}s/symbol), cold {coldCycle:.4f}s, "
+			"alloc {allocBlocks} blocks/{allocBytes}B, peak {peakBytes}B".format(**res))
+
+	if previous is not None:
+		print("Compared to {}:".format(previous["version"]))
+		print("\n".join(compareRuns(previous, run)))
+
+if __name__ == "__main__":
+	sys.exit(main())
@@ -0,0 +1,327 @@
+import time
+import threading
+import numpy as np
+
+COLUMNS = ("open", "high", "low", "close", "volume")
+
+class CandleBuffer():
+	def __init__(self, size):
+		# Every row is written twice so the ordered window is always one contiguous slice
+		self.size = size
+		self.data = np.zeros((len(COLUMNS), size * 2))
+		self.pos = 0
+		self.count = 0
+		self.lastIdx = None
+
+	def __len__(self):
+		return self.count
+
+	def append(self, row):
+		idx = self.pos % self.size
+		self.data[:, idx] = row
+		self.data[:, idx + self.size] = row
+		self.pos += 1
+		self.count = min(self.count + 1, self.size)
+
+	def setLast(self, row):
+		idx = (self.pos - 1) % self.size
+		self.data[:, idx] = row
+		self.data[:, idx + self.size] = row
+
+	def last(self, col):
+		return self.data[COLUMNS.index(col), (self.pos - 1) % self.size]
+
+	def reset(self):
+		self.pos = 0
+		self.count = 0
+		self.lastIdx = None
+
+	def window(self):
+		end = (self.pos - 1) % self.size + self.size + 1
+		return {col: self.data[i, end - self.count:end] for i, col in enumerate(COLUMNS)}
+
+def stackBuffers(buffers):
+	# Plain arrays only, so snapshots load without pickle
+	return {
+		"data": np.stack([buf.data for buf in buffers]) if buffers else np.zeros((0, 0, 0)),
+		"pos": np.array([buf.pos for buf in buffers], dtype=np.int64),
+		"count": np.array([buf.count for buf in buffers], dtype=np.int64),
+		"lastIdx": np.array([buf.lastIdx for buf in buffers], dtype=np.int64)
+	}
+
+def unstackBuffer(buf, arrays, i):
+	buf.data[:] = arrays["data"][i]
+	buf.pos = int(arrays["pos"][i])
+	buf.count = int(arrays["count"][i])
+	buf.lastIdx = int(arrays["lastIdx"][i])
+
+def mergeCandles(first, last):
+	if first is None:
+		return last.copy()
+	return np.array([first[0], max(first[1], last[1]), min(first[2], last[2]), last[3], first[4] + last[4]])
+
+class CandleAggregator():
+	# One higher timeframe built from base candle updates, O(1) per update
+	def __init__(self, ratio, size=50, onClose=None):
+		self.ratio = ratio
+		self.onClose = onClose
+		self.buffer = CandleBuffer(size)
+		self.closed = None
+		self.baseIdx = None
+		self.baseRow = None
+
+	def seed(self, rows, baseIdx, baseRow):
+		# Last row is the forming candle and already includes the forming base candle
+		self.buffer.reset()
+		for row in rows:
+			self.buffer.append(row)
+		self.buffer.lastIdx = baseIdx // self.ratio
+
+		self.closed = np.array(rows[-1], dtype=float)
+		self.closed[4] -= baseRow[4]
+		self.baseIdx = baseIdx
+		self.baseRow = np.array(baseRow, dtype=float)
+
+	def update(self, baseIdx, row):
+		if baseIdx < self.baseIdx:
+			return True
+
+		if baseIdx > self.baseIdx:
+			# Previous base candle closed
+			self.closed = mergeCandles(self.closed, self.baseRow)
+			bucket = baseIdx // self.ratio
+			if bucket != self.buffer.lastIdx:
+				if bucket != self.buffer.lastIdx + 1:
+					return False # Gap, needs a reseed
+				self.buffer.setLast(self.closed)
+				if self.onClose is not None:
+					self.onClose(self.buffer.lastIdx, self.closed)
+				self.buffer.append(row)
+				self.buffer.lastIdx = bucket
+				self.closed = None
+			self.baseIdx = baseIdx
+
+		self.baseRow = np.array(row, dtype=float)
+		self.buffer.setLast(mergeCandles(self.closed, self.baseRow))
+		return True
+
+class CandleCache():
+	def __init__(self, fetch, timeframe, size=50, clock=time):
+		self.fetch = fetch
+		self.timeframe = timeframe
+		self.size = size
+		self.clock = clock
+		self.buffers = {}
+		self.timeframes = {}
+		self.aggregators = {}
+		self.listeners = []
+		self.lock = threading.Lock()
+
+	def addTimeframe(self, timeframe, fetch, size=None):
+		# Built locally from the base candles, fetch is only used once per symbol to seed history
+		if timeframe % self.timeframe:
+			raise ValueError("Timeframe {}s is not a multiple of {}s".format(timeframe, self.timeframe))
+		self.timeframes[timeframe] = (fetch, size or self.size)
+
+	def onClose(self, listener):
+		# listener(symbol, timeframe, candleIdx, row) for every closed candle, called under the lock.
+		# Reloads repeat candles already seen, listeners skip indexes they have.
+		self.listeners.append(listener)
+
+	def emitClosed(self, symbol, timeframe, firstIdx, rows):
+		for listener in self.listeners:
+			for i, row in enumerate(rows):
+				listener(symbol, timeframe, firstIdx + i, row)
+
+	def frameRows(self, frame):
+		return frame[list(COLUMNS)].to_numpy(dtype=float)
+
+	def candleIdx(self):
+		return int(self.clock.time() // self.timeframe)
+
+	def dropAggregators(self, symbol):
+		for timeframe in self.timeframes:
+			self.aggregators.pop((symbol, timeframe), None)
+
+	def feedAggregators(self, symbol, candleIdx, row):
+		for timeframe in self.timeframes:
+			agg = self.aggregators.get((symbol, timeframe))
+			if agg is not None and not agg.update(candleIdx, row):
+				del self.aggregators[(symbol, timeframe)]
+
+	def frameIdx(self, frame):
+		# Candle index of every row from the exchange's own open times, None without a time column
+		if "time" not in frame:
+			return None
+		return frame["time"].to_numpy().astype(np.int64) // 1000 // self.timeframe
+
+	def load(self, symbol, buf, candleIdx):
+		frame = self.fetch(symbol, self.size)
+		rows = self.frameRows(frame)
+		idx = self.frameIdx(frame)
+		if idx is not None and len(idx):
+			candleIdx = int(idx[-1]) # The local clock may be a boundary off
+		with self.lock:
+			buf.reset()
+			for row in rows:
+				buf.append(row)
+			buf.lastIdx = candleIdx
+			self.dropAggregators(symbol)
+			self.emitClosed(symbol, self.timeframe, candleIdx - len(rows) + 1, rows[:-1])
+
+	def update(self, symbol):
+		candleIdx = self.candleIdx()
+		buf = self.buffers.get(symbol)
+		if buf is None:
+			buf = self.buffers[symbol] = CandleBuffer(self.size)
+
+		# Full window on first use or when too far behind
+		missed = None if buf.lastIdx is None else candleIdx - buf.lastIdx
+		if missed is None or missed < 0 or missed >= self.size - 1:
+			self.load(symbol, buf, candleIdx)
+			return buf
+
+		# Last known candle (now closed) + every candle opened since
+		frame = self.fetch(symbol, missed + 1)
+		rows = self.frameRows(frame)
+		idx = self.frameIdx(frame)
+		if idx is None:
+			inSync = len(rows) >= missed + 1 and rows[0][0] == buf.last("open")
+		else:
+			# Matched on open time, rows the buffer already moved past are skipped
+			newer = idx >= buf.lastIdx
+			rows, idx = rows[newer], idx[newer]
+			inSync = len(idx) > 0 and idx[0] == buf.lastIdx and idx[-1] - idx[0] == len(idx) - 1
+			if inSync:
+				candleIdx = int(idx[-1])
+		if not inSync:
+			self.load(symbol, buf, candleIdx) # Out of sync
+			return buf
+
+		with self.lock:
+			firstIdx = buf.lastIdx
+			buf.setLast(rows[0])
+			for row in rows[1:]:
+				buf.append(row)
+			buf.lastIdx = candleIdx
+
+			for i, row in enumerate(rows):
+				self.feedAggregators(symbol, firstIdx + i, row)
+			self.emitClosed(symbol, self.timeframe, firstIdx, rows[:-1])
+
+		return buf
+
+	def aggregatorClose(self, symbol, timeframe):
+		return lambda candleIdx, row: self.emitClosed(symbol, timeframe, candleIdx, [row])
+
+	def aggregated(self, symbol, timeframe, buf):
+		agg = self.aggregators.get((symbol, timeframe))
+		if agg is None:
+			fetch, size = self.timeframes[timeframe]
+			rows = self.frameRows(fetch(symbol, size))
+			with self.lock:
+				agg = CandleAggregator(timeframe // self.timeframe, size, self.aggregatorClose(symbol, timeframe))
+				agg.seed(rows, buf.lastIdx, buf.data[:, (buf.pos - 1) % buf.size])
+				self.aggregators[(symbol, timeframe)] = agg
+				self.emitClosed(symbol, timeframe, agg.buffer.lastIdx - len(rows) + 1, rows[:-1])
+		return agg.buffer
+
+	def get(self, symbol, timeframe=None):
+		buf = self.update(symbol)
+		if timeframe is not None and timeframe != self.timeframe:
+			buf = self.aggregated(symbol, timeframe, buf)
+		return buf.window()
+
+	def push(self, symbol, openTime, row):
+		# Streamed update, openTime in ms
+		candleIdx = int(openTime // 1000 // self.timeframe)
+		with self.lock:
+			buf = self.buffers.get(symbol)
+			if buf is None or buf.lastIdx is None:
+				return False # Needs a REST window first
+
+			if candleIdx == buf.lastIdx:
+				buf.setLast(row)
+			elif candleIdx == buf.lastIdx + 1:
+				self.emitClosed(symbol, self.timeframe, buf.lastIdx, [buf.data[:, (buf.pos - 1) % buf.size].copy()])
+				buf.append(row)
+				buf.lastIdx = candleIdx
+			else:
+				if candleIdx > buf.lastIdx:
+					buf.lastIdx = None # Missed candles, reload on next get
+					self.dropAggregators(symbol)
+				return False
+			
+			self.feedAggregators(symbol, candleIdx, row)
+			return True
+
+	def stale(self, symbol):
+		# No window, or missed stream candles, until the next get
+		with self.lock:
+			buf = self.buffers.get(symbol)
+			return buf is None or buf.lastIdx is None
+
+	def window(self, symbol, timeframe=None):
+		# Copy, safe to read while the feed keeps pushing
+		with self.lock:
+			if timeframe is not None and timeframe != self.timeframe:
+				agg = self.aggregators.get((symbol, timeframe))
+				buf = None if agg is None else agg.buffer
+			else:
+				buf = self.buffers.get(symbol)
+			if buf is None or buf.lastIdx is None or not len(buf):
+				return None
+			return {col: values.copy() for col, values in buf.window().items()}
+
+	def snapshot(self):
+		# Every loaded window, aggregated timeframes under "<timeframe>/" keys
+		with self.lock:
+			symbols = [symbol for symbol, buf in self.buffers.items() if buf.lastIdx is not None]
+			state = stackBuffers([self.buffers[symbol] for symbol in symbols])
+			state["symbols"] = np.array(symbols, dtype=str)
+			state["timeframe"] = np.array([self.timeframe, self.size])
+
+			for timeframe in self.timeframes:
+				keys = [key for key in self.aggregators if key[1] == timeframe]
+				aggs = [self.aggregators[key] for key in keys]
+				arrays = stackBuffers([agg.buffer for agg in aggs])
+				arrays["symbols"] = np.array([key[0] for key in keys], dtype=str)
+				arrays["closed"] = np.array([np.full(len(COLUMNS), np.nan) if agg.closed is None else agg.closed for agg in aggs]).reshape(-1, len(COLUMNS))
+				arrays["baseIdx"] = np.array([agg.baseIdx for agg in aggs], dtype=np.int64)
+				arrays["baseRow"] = np.array([agg.baseRow for agg in aggs]).reshape(-1, len(COLUMNS))
+				for name, values in arrays.items():
+					state["{}/{}".format(timeframe, name)] = values
+
+		return state
+
+	def restore(self, state):
+		# Windows from an older snapshot are caught up incrementally by the next get()
+		if list(state["timeframe"]) != [self.timeframe, self.size]:
+			return 0
+
+		with self.lock:
+			for i, symbol in enumerate(state["symbols"]):
+				buf = self.buffers[str(symbol)] = CandleBuffer(self.size)
+				unstackBuffer(buf, state, i)
+
+			for timeframe, (fetch, size) in self.timeframes.items():
+				prefix = "{}/".format(timeframe)
+				arrays = {key[len(prefix):]: values for key, values in state.items() if key.startswith(prefix)}
+				if not arrays or arrays["data"].shape[1:] != (len(COLUMNS), size * 2):
+					continue
+
+				for i, symbol in enumerate(arrays["symbols"]):
+					agg = CandleAggregator(timeframe // self.timeframe, size, self.aggregatorClose(str(symbol), timeframe))
+					unstackBuffer(agg.buffer, arrays, i)
+					closed = arrays["closed"][i]
+					agg.closed = None if np.isnan(closed).all() else closed.copy()
+					agg.baseIdx = int(arrays["baseIdx"][i])
+					agg.baseRow = arrays["baseRow"][i].copy()
+					self.aggregators[(str(symbol), timeframe)] = agg
+
+		return len(state["symbols"])
+
+	def drop(self, symbol):
+		with self.lock:
+			self.buffers.pop(symbol, None)
+			self.dropAggregators(symbol)
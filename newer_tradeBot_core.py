@@ -1,42 +1,129 @@
 from . import api
 from . import storage
 from . import discord
+from .newer_tradeBot_candles import CandleCache
+from .newer_tradeBot_signals import stackCandles, candleStatus, volumeStatus, isEntry, isExit, isStopLoss, ENTER_MULT, EXIT_MULT
+from .newer_tradeBot_symbols import SymbolUniverse, symbolShard
+from .newer_tradeBot_scheduler import CycleScheduler
+from .newer_tradeBot_journal import BalanceJournal
+from .newer_tradeBot_notify import NotifyQueue
+from .newer_tradeBot_metrics import Metrics, timed
+from .newer_tradeBot_ratelimit import ScheduledTradeApi
+from .newer_tradeBot_ledger import Ledger
+from .newer_tradeBot_portfolio import PortfolioView
+from .newer_tradeBot_state import saveState, savePortfolio, loadState
+from .newer_tradeBot_monitor import ExitMonitor
+from .newer_tradeBot_analyzer import MoveAnalyzer
+from .newer_tradeBot_archive import CandleArchive
+from .newer_tradeBot_profiler import SamplingProfiler
 
 import time
+import queue
 import logging
+import threading
+import numpy as np
 from datetime import date
+from concurrent.futures import ThreadPoolExecutor, Future
 
 class TradeBot():
-	def __init__(self, testMode=False, resetBalance=False, daemon=False, verbose=False, baseAmount=1000.0):
+	def __init__(self, testMode=False, resetBalance=False, daemon=False, verbose=False, baseAmount=1000.0, fetchWorkers=8, settleOffset=0.5, feed=None, journalPath="balance.journal", enterMult=ENTER_MULT, exitMult=EXIT_MULT, metricsPort=None, metricsFile=None, trader=None, stor=None, discordBot=None, weightPerMinute=1200, orderWorkers=8, shard=None, ledger=None, statePath="trader_state.npz", stateEvery=60.0, exitFeed=None, onlineStats=False, statsHalfLife=500, archivePath=None, clock=time, cycleBudget=0.8, profileCycles=10, profileSignal=False):
 		# Log
 		logLevel = logging.INFO
 		logFormat = "%(asctime)s %(levelname)s %(name)s: %(message)s"
+		logDir = "logs"
 		if daemon:
-			logFile = "logs/trader_{}.log".format(date.today())
+			logFile = "{}/trader_{}.log".format(logDir, date.today())
 			logging.basicConfig(filename=logFile, format=logFormat, level=logLevel)
 		else:
 			logging.basicConfig(format=logFormat, level=logLevel)
 		
-		self._l = logging.getLogger("Trader")
+		self._l = logging.getLogger("Trader" if shard is None else "Trader{}".format(shard[0]))
 		self._l.setLevel(logLevel)
 		
-		# Discord
-		self.discord = discord.DiscordBot()
-		self.discord.notify(":thought_balloon: Trader Started!")
+		# Sampling profile of the next cycles on SIGUSR1, written next to the log.
+		# Only daemons (or on request) take over the process-wide signal handler.
+		self.profiler = SamplingProfiler(logDir)
+		if daemon or profileSignal:
+			self.profiler.installSignal(profileCycles)
+		
+		self.clock = clock # Candle and cycle timing, the exchange's clock (a VirtualClock in simulations)
+		self.startTime = time.monotonic()
+		self.firstDecision = None
+		
+		# Independent startup steps run concurrently, Discord keeps logging in behind its queue.
+		# Every exchange request is paid for from one weight budget.
+		self.trader = ScheduledTradeApi(api.TradeApi() if trader is None else trader, weightPerMinute)
+		initPool = ThreadPoolExecutor(max_workers=4, thread_name_prefix="init")
+		discordBot = initPool.submit(discord.DiscordBot) if discordBot is None else discordBot
+		connected = initPool.submit(self.trader.binanceConnect)
+		stor = initPool.submit(storage.Storage) if stor is None else stor
+		state = initPool.submit(loadState, statePath if ledger is None else None)
+		initPool.shutdown(wait=False)
+		
+		# Discord, queued so a slow webhook never holds up trading
+		self.discord = NotifyQueue(discordBot)
+		if shard is None:
+			self.discord.notify(":thought_balloon: Trader Started!")
+		
+		# Metrics
+		self.metrics = Metrics()
+		self.metrics.addSource("notify", self.discord.stats)
+		self.metrics.addSource("api", self.trader.stats)
+		if metricsPort is not None:
+			self.metrics.serve(metricsPort)
+		if metricsFile:
+			self.metrics.flushEvery(metricsFile)
 
 		self.lastCycle = 0
+		self.symbolParts = {}
 		self.testMode = testMode
 		self.verbose = verbose
+		self.settleOffset = settleOffset
+		self.enterMult = enterMult
+		self.exitMult = exitMult
+		self.feed = feed
+		self.shard = shard
+		self.owner = None if shard is None else shard[0] # Ledger reservations are tagged per shard
+		self.universe = SymbolUniverse(None if shard is None else self.ownsSymbol)
+		self.statePath = statePath
+		self.stateEvery = stateEvery
+		self.lastState = time.monotonic()
+		self.fetchPool = ThreadPoolExecutor(max_workers=fetchWorkers, thread_name_prefix="fetch")
+		self.entryBatch = fetchWorkers * 8
+		self.deferred = []
+		self.orderPool = ThreadPoolExecutor(max_workers=orderWorkers, thread_name_prefix="order")
 
-		# Connect to exchange
-		self.trader = api.TradeApi()
-		if self.trader.binanceConnect():
-			self._l.info("CONNECTED to Binance")
-		
 		# Storage
-		self.stor = storage.Storage()
+		self.stor = stor.result() if isinstance(stor, Future) else stor
 		self.tradeFee = self.stor.getFee("binance")
 		
+		# Rolling candles, only newer candles are requested after the first fetch.
+		# longCandle is built locally from shortCandle when it is a multiple of it.
+		shortSec = self.timeToSec(self.gblConf("shortCandle"))
+		self.cycleBudget = shortSec * cycleBudget # Fraction of the candle a cycle may use
+		self.longFrame = self.timeToSec(self.gblConf("longCandle"))
+		self.baseCandle = self.gblConf("longCandle")
+		if self.longFrame > shortSec and self.longFrame % shortSec == 0:
+			self.baseCandle = self.gblConf("shortCandle")
+		self.candleCache = CandleCache(self.fetchRawCandles, self.timeToSec(self.baseCandle), clock=clock)
+		if self.candleCache.timeframe != self.longFrame:
+			self.candleCache.addTimeframe(self.longFrame, lambda symbol, maxCandles: self.fetchRawCandles(symbol, maxCandles, self.gblConf("longCandle")))
+		
+		# avgUp/avgDown kept current from every closed longCandle, starting from the analyzed values
+		self.analyzer = None
+		if onlineStats:
+			self.analyzer = MoveAnalyzer(self.universe.table, self.longFrame, statsHalfLife)
+			self.candleCache.onClose(self.analyzer.onClose)
+		
+		# Every closed candle kept on disk for backtests and analysis
+		self.archive = None
+		if archivePath:
+			self.archive = CandleArchive(archivePath)
+			self.candleCache.onClose(self.archive.onClose)
+		
+		# Exits checked on every longCandle tick of held symbols, between cycles
+		self.monitor = None if exitFeed is None else ExitMonitor(exitFeed, self.gblConf("longCandle"), self.checkExit)
+		
 		# Get symbols to trade
 		symbolList = self.loadTradeSymbolList()
 		if not symbolList:
@@ -46,24 +133,57 @@ class TradeBot():
 		msg = "Trading symbols: {}".format(", ".join(symbolList))
 		self._l.info(msg)
 		self.discord.notify(msg)
+		
+		if connected.result():
+			self._l.info("CONNECTED to Binance")
+		
+		if ledger is not None:
+			# Shard worker, balances (and their snapshot) are owned by the coordinator
+			self.ledger = ledger
+			self.statePath = None
+			return
+		
+		self.journal = BalanceJournal(self.stor, journalPath, onSnapshot=self.persistPortfolio)
+		self.ledger = Ledger(self.stor, self.journal)
+		
+		# Last known portfolio and candle windows, the journal is replayed on top
+		state = state.result()
+		if state is not None:
+			assets = [str(asset) for asset in state.get("assets", ())]
+			if "portfolio" in state:
+				self.ledger.restore(assets, state["portfolio"])
+			restored = self.candleCache.restore(state) if "timeframe" in state else 0
+			self._l.info("Restored {} assets and {} candle windows from {}".format(len(assets), restored, statePath))
 
 		# Test mode OR Live mode
+		reconcile = None
 		if testMode:
 			self._l.info("Setting cached balances...")
 			self.stor.loadBalance()
+			self.replayJournal()
 			if resetBalance or not self.stor.getBalances():
 				self._l.info("Resetting balances...")
 				self.stor.resetBalance(symbolList)
 				self.stor.setBalance(self.gblConf("baseSymbol"), baseAmount)
-				self.stor.saveBalance()
 		else:
-			# Set symbols balance from exchange
-			self._l.info("Setting live balances...")
-			balance = self.trader.getBalance()
-			for symbol in symbolList:
-				if symbol in balance["free"]:
-					self.stor.setBalance(symbol, balance["free"][symbol])
-			self.stor.saveBalance()
+			# Entries changed since the last snapshot
+			self.replayJournal()
+			
+			# Set symbols balance from exchange, in the background when there is known state to trade on
+			if state is None:
+				self._l.info("Setting live balances...")
+				self.reconcileBalances(symbolList, initial=True)
+			else:
+				reconcile = threading.Thread(target=self.reconcileBalances, args=(symbolList,), name="reconcile", daemon=True)
+		
+		# Compact restored state into a fresh snapshot, no record may land between the save and the truncate
+		self.ledger.load(symbolList)
+		with self.ledger.lock:
+			self.journal.snapshot()
+		if reconcile is not None:
+			self._l.info("Reconciling live balances in the background...")
+			reconcile.start()
+		self.metrics.observe("startup", time.monotonic() - self.startTime)
 		
 		msg = "Current Balances: " + " | ".join(self.stor.getBalancesInfo())
 		self._l.info(msg)
@@ -76,11 +196,17 @@ class TradeBot():
 				return int(strTime[:-1]) * suffixes[sfx]
 		return int(strTime)
 	
+	def splitSymbol(self, symbol):
+		parts = self.symbolParts.get(symbol)
+		if parts is None:
+			parts = self.symbolParts[symbol] = tuple(symbol.split("/"))
+		return parts
+	
 	def coin(self, symbol):
-		return symbol.split("/")[0]
+		return self.splitSymbol(symbol)[0]
 	
 	def fiat(self, symbol):
-		return symbol.split("/")[1]
+		return self.splitSymbol(symbol)[1]
 	
 	def gblConf(self, key):
 		return self.stor.gblConf(key)
@@ -88,6 +214,36 @@ class TradeBot():
 	def loadTradeSymbolData(self):
 		return self.stor.loadSymbols()
 	
+	def ownsSymbol(self, symbol):
+		return self.shard is None or symbolShard(symbol, self.shard[1]) == self.shard[0]
+	
+	def refreshSymbols(self):
+		# Nothing to do unless storage hands back different content
+		universe = self.universe
+		if not universe.update(self.stor.loadSymbols(cache=True), self.stor.getObsoleteSymbols(cache=True), self.ledger.assetId):
+			return
+		
+		for symbol in universe.added:
+			params = universe.table[symbol]
+			self.symbolParts[symbol] = (params.coin, params.fiat)
+		for symbol in universe.removed:
+			self.candleCache.drop(symbol)
+		if self.analyzer is not None:
+			for symbol in universe.updated + universe.removed:
+				self.analyzer.reset(symbol)
+		
+		if universe.version > 1:
+			self._l.info("Symbol list changed: {} added, {} removed".format(len(universe.added), len(universe.removed)))
+			self.metrics.inc("symbolReloads")
+	
+	def getSymbolTable(self):
+		self.refreshSymbols()
+		return self.universe.table
+	
+	def getObsoleteSymbols(self):
+		self.refreshSymbols()
+		return self.universe.obsolete
+	
 	def loadTradeSymbolList(self):
 		tradeSymbols = self.loadTradeSymbolData()
 		if tradeSymbols is None:
@@ -101,58 +257,140 @@ class TradeBot():
 		
 		return symList
 	
-	def getCandles(self, symbol, maxCandles=50):
-		return self.trader.getCandles(symbol, self.gblConf("longCandle"), maxCandles)
+	def fetchRawCandles(self, symbol, maxCandles=50, timeframe=None):
+		return self.trader.getCandles(symbol, timeframe or self.baseCandle, maxCandles)
+	
+	def getCandles(self, symbol):
+		return self.candleCache.get(symbol, self.longFrame)
+	
+	@timed("fetch")
+	def fetchCandles(self, symbolList):
+		# Fetch all symbols concurrently, limited by the pool size
+		futures = {}
+		for symbol in symbolList:
+			if symbol not in futures:
+				futures[symbol] = self.fetchPool.submit(self.getCandles, symbol)
+		
+		candles = {}
+		for symbol, future in futures.items():
+			try:
+				candles[symbol] = future.result()
+			except Exception as e:
+				self._l.error("Failed to get candles for {}: {}".format(symbol, e))
+				self.metrics.inc("fetchFailures")
+				continue
+		
+		return candles
 	
 	def getCandleStatus(self, candles):
-		currPrice = candles["close"].iloc[-1]
-		currOpen = candles["open"].iloc[-1]
+		opens = np.asarray(candles["open"])
+		currPrice = np.asarray(candles["close"])[-1]
+		currOpen = opens[-1]
 		cdlDir = 1 if currPrice > currOpen else -1
 		
 		# Extend "open" search to revious candles
-		for i in range(2, len(candles)+1):
-			if cdlDir > 0 and candles["open"].iloc[-i] >= currOpen:
+		for i in range(2, len(opens)+1):
+			if cdlDir > 0 and opens[-i] >= currOpen:
 				break
 
-			if cdlDir < 0 and candles["open"].iloc[-i] <= currOpen:
+			if cdlDir < 0 and opens[-i] <= currOpen:
 				break
 			
-			currOpen = candles["open"].iloc[-i]
+			currOpen = opens[-i]
 
 		return cdlDir, currOpen, currPrice
 	
 	def getVolumeStatus(self, candles, bars=2):
-		lastBar = candles["volume"].iloc[-bars]
+		opens, closes, volumes = [np.asarray(candles[col]) for col in ("open", "close", "volume")]
+		lastBar = volumes[-bars]
 		for i in range(1, bars+1)[::-1]:
-			if lastBar < candles["volume"].iloc[-i]:
+			if lastBar < volumes[-i]:
 				return False
 
-			if candles["close"].iloc[-i] < candles["open"].iloc[-i]:
+			if closes[-i] < opens[-i]:
 				return False
 			
-			lastBar = candles["volume"].iloc[-i]
+			lastBar = volumes[-i]
 		
 		return True
 	
+	def getStatus(self, candles):
+		return self.getCandleStatus(candles) + (self.getVolumeStatus(candles),)
+	
+	@timed("signals")
+	def getBatchStatus(self, candles):
+		# Same as getStatus, for every symbol in one vectorized pass
+		symbolList = list(candles)
+		if not symbolList:
+			return {}
+		
+		stacked, lengths = stackCandles([candles[symbol] for symbol in symbolList])
+		sDir, sOpen, sPrice = candleStatus(stacked["open"], stacked["close"], lengths)
+		volumeValid = volumeStatus(stacked["open"], stacked["close"], stacked["volume"])
+		
+		return dict(zip(symbolList, zip(sDir.tolist(), sOpen.tolist(), sPrice.tolist(), volumeValid.tolist())))
+	
 	def getSymbolEntry(self, symbol):
-		return self.stor.getEntry(symbol)
+		return self.ledger.getEntry(symbol)
 	
 	def hasSymbolEntry(self, symbol):
-		return self.stor.hasEntry(symbol)
+		return self.ledger.hasEntry(symbol)
 
+	def replayJournal(self):
+		count = self.journal.replay()
+		if count:
+			self._l.info("Replayed {} balance journal records".format(count))
+	
+	def reconcileBalances(self, symbolList, initial=False):
+		try:
+			balance = self.trader.getBalance()
+		except Exception as e:
+			self._l.error("Balance reconcile failed: {}".format(e))
+			return
+		
+		changed = []
+		for symbol in symbolList:
+			if symbol in balance["free"]:
+				if initial:
+					self.stor.setBalance(symbol, balance["free"][symbol])
+				elif self.ledger.setBalance(symbol, balance["free"][symbol]):
+					changed.append(symbol)
+		
+		if changed:
+			self._l.warning("Exchange balances differed from restored state: {}".format(", ".join(changed)))
+		self.metrics.observe("reconcile", time.monotonic() - self.startTime)
+	
+	def persistState(self, force=False):
+		if not self.statePath:
+			return
+		if not force and time.monotonic() - self.lastState < self.stateEvery:
+			return
+		
+		saveState(self.statePath, self.ledger, self.candleCache)
+		self.lastState = time.monotonic()
+	
+	def persistPortfolio(self):
+		# Journal compaction runs under the ledger lock on an order thread: only the portfolio
+		# has to match the truncate, candle windows are left to persist()
+		if self.statePath:
+			savePortfolio(self.statePath, self.ledger)
+	
+	def persist(self):
+		self.ledger.sync()
+		self.persistState()
+		if self.archive is not None:
+			self.archive.flush()
+	
+	def markDecision(self):
+		# Startup to first trading decision, what a warm start is for
+		if self.firstDecision is None:
+			self.firstDecision = time.monotonic() - self.startTime
+			self.metrics.observe("firstDecision", self.firstDecision)
+			self._l.info("First decision {:.3f}s after start".format(self.firstDecision))
+	
+	@timed("updateBalance")
 	def updateBalance(self, symbolList, valueList, entry, setAbsolute=False):
-		if setAbsolute:
-			self.stor.setBalance(symbolList[0], valueList[0])
-			self.stor.setBalance(symbolList[1], valueList[1])
-		else:
-			self.stor.addBalance(symbolList[0], valueList[0])
-			self.stor.addBalance(symbolList[1], valueList[1])
-
-		self.stor.setEntry(symbolList[0], entry)
-		self.stor.saveBalance()
-
-		coinBlc = self.stor.getBalance(symbolList[0])
-		fiatBlc = self.stor.getBalance(symbolList[1])
+		coinBlc, fiatBlc = self.ledger.apply(symbolList, valueList, entry, setAbsolute)
 		balances = "{}: {} | {}: {}".format(symbolList[0], coinBlc, symbolList[1], fiatBlc)
 		
 		if entry != 0.0:
@@ -161,154 +399,434 @@ class TradeBot():
 			self._l.info(" ** New Exit: {}".format(symbolList[0]))
 		self._l.info(" ** Balance updated: "+balances)
 		
-	def buy(self, symbol, price, totalCost):
+	@timed("buy")
+	def buy(self, symbol, price, totalCost, reserved=False, syncFiat=True):
 		# TODO: Make sure it's still possible to place order if price changes
 		
-		#Check for free balance
-		coin, fiat = symbol.split("/")
-		fiatBalance = self.stor.getBalance(fiat)
-		if self.stor.getBalance(fiat) < totalCost:
+		#Reserve free balance, concurrent buys can't spend it twice
+		coin, fiat = self.splitSymbol(symbol)
+		if not reserved and not self.ledger.reserve(fiat, totalCost, self.owner):
 			msg = "\n".join([
 				"There isn't enough balance to buy {}".format(symbol),
-				"Fiat balance: {} | Requested: {}".format(fiatBalance, totalCost)
+				"Fiat balance: {} | Requested: {}".format(self.ledger.available(fiat), totalCost)
 			])
 			self._l.error(msg)
 			return {"success":False, "msg":msg}
 		
-		amount = self.gblConf("totalCost") / price / (1 + self.tradeFee)
-		
-		# Buy
-		if not self.testMode:
-			balances = self.trader.buy(symbol, amount)
-			if balances is None:
-				msg = "Failed to buy {} !".format(symbol)
-				self._l.error(msg)
-				return {"success":False, "msg":msg}
+		try:
+			amount = self.gblConf("totalCost") / price / (1 + self.tradeFee)
 			
-			self.updateBalance(
-				[coin, fiat],
-				[balances[fiat]["free"], balances[coin]["free"]],
-				price,
-				setAbsolute=True
-			)
-			
-		else:
-			self.updateBalance(
-				[coin, fiat],
-				[amount, -totalCost],
-				price,
-				setAbsolute=False
-			)
+			# Buy
+			if not self.testMode:
+				with self.metrics.span("order"):
+					balances = self.trader.buy(symbol, amount)
+				if balances is None:
+					msg = "Failed to buy {} !".format(symbol)
+					self._l.error(msg)
+					self.metrics.inc("orderFailures")
+					return {"success":False, "msg":msg}
+				
+				self.updateBalance(
+					[coin, fiat],
+					[balances[coin]["free"], balances[fiat]["free"] if syncFiat else None],
+					price,
+					setAbsolute=True
+				)
+				
+			else:
+				self.updateBalance(
+					[coin, fiat],
+					[amount, -totalCost],
+					price,
+					setAbsolute=False
+				)
+		finally:
+			if syncFiat: # Batch buys keep it until executeOrders has refreshed fiat
+				self.ledger.release(fiat, totalCost, self.owner)
 		
-		msg = "{0} Bought at {1}\nBalance: {2:.3f}".format(coin, price, self.stor.getBalance(coin))
-		return {"success": True, "msg": msg}
+		self.metrics.inc("orders")
+		msg = "{0} Bought at {1}\nBalance: {2:.3f}".format(coin, price, self.ledger.getBalance(coin))
+		return {"success": True, "msg": msg, "balances": None if self.testMode else balances}
 	
-	def sell(self, symbol, price, totalCost=0):
+	@timed("sell")
+	def sell(self, symbol, price, totalCost=0, syncFiat=True):
 		#Check for free balance
-		coin, fiat = symbol.split("/")
-		coinBalance = self.stor.getBalance(coin)
+		coin, fiat = self.splitSymbol(symbol)
+		coinBalance = self.ledger.available(coin)
 		if totalCost == 0: 
 			amount = coinBalance # Sell all
 		else:
 			amount = self.gblConf("totalCost") / price # Sell amount for cost
-			if amount > coinBalance:
-				msg = "\n".join([
-					"There isn't enough balance to sell {}".format(symbol),
-					"Coin balance: {} | Requested: {}".format(coinBalance, amount)
-				])
-				self._l.error(msg)
-				return {"success": False, "msg":msg}
-		
-		# Sell
-		if not self.testMode:
-			balances = self.trader.sell(symbol, amount)
-			if balances is None:
-				msg = "Failed to sell {} !".format(symbol)
-				self._l.error(msg)
-				return {"success": False, "msg":msg}
-			
-			self.updateBalance(
-				[coin, fiat],
-				[balances[coin]["free"], balances[fiat]["free"]],
-				0.0,
-				setAbsolute=True
-			)
+		
+		if amount <= 0 or not self.ledger.reserve(coin, amount, self.owner):
+			msg = "\n".join([
+				"There isn't enough balance to sell {}".format(symbol),
+				"Coin balance: {} | Requested: {}".format(coinBalance, amount)
+			])
+			self._l.error(msg)
+			return {"success": False, "msg":msg}
+		
+		try:
+			# Sell
+			if not self.testMode:
+				with self.metrics.span("order"):
+					balances = self.trader.sell(symbol, amount)
+				if balances is None:
+					msg = "Failed to sell {} !".format(symbol)
+					self._l.error(msg)
+					self.metrics.inc("orderFailures")
+					return {"success": False, "msg":msg}
+				
+				self.updateBalance(
+					[coin, fiat],
+					[balances[coin]["free"], balances[fiat]["free"] if syncFiat else None],
+					0.0,
+					setAbsolute=True
+				)
+				
+			else:
+				cost = amount * price / (1 + self.tradeFee)
+				self.updateBalance(
+					[coin, fiat],
+					[-amount, cost],
+					0.0,
+					setAbsolute=False
+				)
+		finally:
+			self.ledger.release(coin, amount, self.owner)
+		
+		self.metrics.inc("orders")
+		msg = "{0} Sold at {1}\nBalance: {2:.2f}".format(coin, price, self.ledger.getBalance(fiat))
+		return {"success": True, "msg": msg, "balances": None if self.testMode else balances}
+	
+	def decideSymbol(self, params, status, entries=None):
+		# Data, entries is a PortfolioView for the cycle or the ledger itself
+		entries = self.ledger if entries is None else entries
+		symbol = params.symbol
+		sDir, sOpen, sPrice, volumeValid = status
+		
+		if self.verbose:
+			self._l.info("{}: Dir={}, Open={}, Close={}".format(symbol, sDir, sOpen, sPrice))
+
+		# Logic
+		if entries.hasEntryById(params.coinId):
+			entryChange = sPrice / entries.entryById(params.coinId) - 1.0
+			if isExit(sDir, entryChange, params.avgUp, self.exitMult): # Exit
+				return {"side": "sell", "symbol": symbol, "price": sPrice, "icon": ":green_circle:", "log": " ** Selling..."}
 			
+			elif isStopLoss(sDir, entryChange, params.avgDown, self.gblConf("sellLossMult")): # Fail
+				return {"side": "sell", "symbol": symbol, "price": sPrice, "icon": ":red_circle:", "log": " ** Selling FLOP..."}
+		
 		else:
-			cost = amount * price / (1 + self.tradeFee)
-			self.updateBalance(
-				[coin, fiat],
-				[-amount, cost],
-				0.0,
-				setAbsolute=False
-			)
-		
-		msg = "{0} Sold at {1}\nBalance: {2:.2f}".format(coin, price, self.stor.getBalance(fiat))
-		return {"success": True, "msg": msg}
-	
-	def tradeLoop(self):
-		self._l.info("Trading!")
-		interval = self.timeToSec(self.gblConf("shortCandle")) # 5min/1min?
+			candleChange = sPrice / sOpen - 1.0
+			if isEntry(sDir, candleChange, params.avgDown, self.enterMult): # Enter
+			#if volumeValid: # Enter
+				return {"side": "buy", "symbol": symbol, "price": sPrice, "icon": ":blue_circle:", "log": " ** Buying..."}
+		
+		return None
+	
+	def decideObsolete(self, symbol, status, entries=None):
+		# Data
+		entries = self.ledger if entries is None else entries
+		sDir, sOpen, sPrice = status[:3]
+		if self.verbose:
+			self._l.info("{}: Dir={}, Open={}, Close={}".format(symbol, sDir, sOpen, sPrice))
 
-		while True:
-			if self.lastCycle > time.time() - interval:
-				time.sleep(1)
-				continue
+		# Logic
+		if entries.hasEntry(self.coin(symbol)):
+			entryChange = sPrice / entries.getEntry(self.coin(symbol)) - 1.0
+			if sDir > 0 and entryChange > self.tradeFee * 2.0:
+				return {"side": "sell", "symbol": symbol, "price": sPrice, "icon": ":yellow_circle:", "log": " ** Selling obsolete..."}
+		
+		return None
+	
+	def checkExit(self, symbol, sOpen, sPrice):
+		# Feed thread: same exit rules as the cycle, on the forming longCandle
+		params = self.universe.table.get(symbol)
+		status = (1 if sPrice > sOpen else -1, sOpen, sPrice, True)
+		if params is not None:
+			order = self.decideSymbol(params, status)
+		elif symbol in self.universe.obsoleteSet:
+			order = self.decideObsolete(symbol, status)
+		else:
+			return
+		
+		if order is not None and order["side"] == "sell":
+			self.metrics.inc("monitorExits")
+			self.placeOrder(order)
+			self.ledger.sync()
+	
+	def watchHeld(self, symbols, obsolete, entries=None):
+		entries = self.portfolioView() if entries is None else entries
+		held = [symbol for symbol, params in symbols.items() if entries.hasEntryById(params.coinId)]
+		held += [symbol for symbol in obsolete if entries.hasEntry(self.coin(symbol))]
+		self.monitor.watch(held)
+	
+	def placeOrder(self, order, reserved=False, syncFiat=True):
+		self._l.info(order["log"])
+		if order["side"] == "buy":
+			res = self.buy(order["symbol"], order["price"], self.gblConf("totalCost"), reserved=reserved, syncFiat=syncFiat)
+		else:
+			res = self.sell(order["symbol"], order["price"], syncFiat=syncFiat) # Sell ALL
+		
+		self.discord.notify(res["msg"], icon=order["icon"])
+		return res
+	
+	def executeOrders(self, orders):
+		if len(orders) == 1:
+			return [self.placeOrder(orders[0])]
+		
+		# Fiat for buys is reserved up front in decision order, buys that don't fit wait for the sells
+		totalCost = self.gblConf("totalCost")
+		futures = []
+		waiting = []
+		reserved = []
+		try:
+			for order in orders:
+				if order["side"] == "buy":
+					fiat = self.fiat(order["symbol"])
+					if not self.ledger.reserve(fiat, totalCost, self.owner):
+						waiting.append(order)
+						continue
+					reserved.append(fiat)
+					futures.append(self.orderPool.submit(self.placeOrder, order, True, False))
+				else:
+					futures.append(self.orderPool.submit(self.placeOrder, order, False, False))
 			
-			self.lastCycle = time.time()
-
-			# Trade symbols in list
-			symbols = self.stor.loadSymbols(cache=True)
-			for symbol in symbols["symbol"]:
-				symbolData = symbols.query("symbol == '{}'".format(symbol))
-				
-				# Data
-				avgUp = symbolData["avgUp"].iloc[0]
-				avgDown = symbolData["avgDown"].iloc[0]
-				candles = self.getCandles(symbol)
-				volumeValid = self.getVolumeStatus(candles)
-				sDir, sOpen, sPrice = self.getCandleStatus(candles)
-				
-				if self.verbose:
-					self._l.info("{}: Dir={}, Open={}, Close={}".format(symbol, sDir, sOpen, sPrice))
+			# Fills come back in any order, so fiat is taken from one balance read after the batch
+			# rather than from each order's own (possibly older) snapshot
+			results = [future.result() for future in futures]
+			if not self.testMode:
+				self.syncFiat({self.fiat(order["symbol"]) for order in orders}, [res["balances"] for res in results if res.get("balances")])
+		finally:
+			# Spent fiat stays reserved until the refreshed balance is in
+			for fiat in reserved:
+				self.ledger.release(fiat, totalCost, self.owner)
+		
+		for order in waiting:
+			results.append(self.placeOrder(order))
+		
+		return results
+	
+	def syncFiat(self, fiats, snapshots):
+		try:
+			balance = self.trader.getBalance()["free"]
+		except Exception as e:
+			self._l.error("Balance refresh failed: {}".format(e))
+			balance = {}
+		
+		for fiat in fiats:
+			if fiat in balance:
+				self.ledger.setBalance(fiat, balance[fiat])
+			else:
+				# The last fill is among the snapshots, so the lowest never overstates fiat
+				values = [snapshot[fiat]["free"] for snapshot in snapshots if fiat in snapshot]
+				if values:
+					self.ledger.setBalance(fiat, min(values))
+	
+	def portfolioView(self):
+		# One ledger round trip, a shard worker's ledger is a proxy to the coordinator
+		return PortfolioView(*self.ledger.snapshot())
+	
+	def tradeBatch(self, symbols, batch, entries):
+		# Fetch, decide and place orders for one slice of the cycle, returns the number of orders
+		candles = self.fetchCandles(batch)
+		status = self.getBatchStatus(candles)
 
-				# Logic
-				if self.hasSymbolEntry(self.coin(symbol)):
-					entryChange = sPrice / self.getSymbolEntry(self.coin(symbol)) - 1.0
-					if sDir > 0 and entryChange > avgUp * 0.8: # Exit
-						self._l.info(" ** Selling...")
-						res = self.sell(symbol, sPrice) # Sell ALL
-						self.discord.notify(res["msg"], icon=":green_circle:")
-					
-					elif sDir < 0 and entryChange < avgDown * self.gblConf("sellLossMult"): # Fail
-						self._l.info(" ** Selling FLOP...")
-						res = self.sell(symbol, sPrice) # Sell ALL
-						self.discord.notify(res["msg"], icon=":red_circle:")
-				
+		orders = []
+		with self.metrics.span("decide"):
+			for symbol in batch:
+				if symbol not in status:
+					continue
+				if symbol in symbols:
+					orders.append(self.decideSymbol(symbols[symbol], status[symbol], entries))
 				else:
-					candleChange = sPrice / sOpen - 1.0
-					if sDir < 0 and candleChange < avgDown * 0.8: # Enter
-					#if volumeValid: # Enter
-						self._l.info(" ** Buying...")
-						res = self.buy(symbol, sPrice, self.gblConf("totalCost"))
-						self.discord.notify(res["msg"], icon=":blue_circle:")
+					orders.append(self.decideObsolete(symbol, status[symbol], entries))
+		self.markDecision()
+		
+		orders = [order for order in orders if order is not None]
+		if orders:
+			with self.metrics.span("orders"):
+				self.executeOrders(orders)
+		return len(orders)
+	
+	def tradeCycle(self):
+		deadline = self.clock.monotonic() + self.cycleBudget
+		symbols = self.getSymbolTable()
+		obsolete = self.getObsoleteSymbols()
+		
+		# Held coins first (exit/stop loss), then obsolete exits, then entries while there is time.
+		# Decided from one portfolio snapshot, taken again only after orders changed it.
+		view = self.portfolioView()
+		held = []
+		entries = []
+		for symbol, params in symbols.items():
+			(held if view.hasEntryById(params.coinId) else entries).append(symbol)
+		heldObsolete = [symbol for symbol in obsolete if symbol not in symbols and view.hasEntry(self.coin(symbol))]
+		
+		# Entries deferred last cycle go first, so the same tail never starves
+		if self.deferred:
+			waiting = set(entries)
+			deferred = [symbol for symbol in self.deferred if symbol in waiting]
+			first = set(deferred)
+			entries = deferred + [symbol for symbol in entries if symbol not in first]
+		
+		with self.metrics.span("exits"):
+			if held and self.tradeBatch(symbols, held, view):
+				view = self.portfolioView()
+			if heldObsolete and self.tradeBatch(symbols, heldObsolete, view):
+				view = self.portfolioView()
+		
+		# Fetched in slices so the deadline is checked between them
+		self.deferred = []
+		with self.metrics.span("entries"):
+			for i in range(0, len(entries), self.entryBatch):
+				if self.clock.monotonic() >= deadline:
+					self.deferred = entries[i:]
+					self.metrics.inc("deferred", len(self.deferred))
+					self._l.warning("Cycle budget spent, deferred {} entry checks".format(len(self.deferred)))
+					break
+				if self.tradeBatch(symbols, entries[i:i + self.entryBatch], view):
+					view = self.portfolioView()
+		
+		with self.metrics.span("persist"):
+			self.persist()
+		
+		if self.monitor is not None:
+			self.watchHeld(symbols, obsolete, view)
+		
+		if self.verbose:
+			self._l.info("-----")
+	
+	def onStreamCandle(self, symbol, openTime, row, closed, eventTime):
+		# Feed thread: update the cache, queue the symbol once per shortCandle close
+		if symbol not in self.streamSymbols:
+			return # Unsubscribed while the event was in flight
+		if not self.candleCache.push(symbol, openTime, row) and self.candleCache.stale(symbol):
+			# Missed candles, reseed over REST before the next decision
+			self._l.warning("Stream gap on {}, reloading candles".format(symbol))
+			self.metrics.inc("streamGaps")
+			self.fetchCandles([symbol])
+			self.candleCache.push(symbol, openTime, row)
+		if closed:
+			eventTime = openTime + self.candleCache.timeframe * 1000
+		
+		period = int(eventTime // 1000 // self.interval)
+		with self.streamLock:
+			if symbol not in self.streamSymbols:
+				return # Removed while the candle was pushed
+			lastPeriod = self.streamPeriods.get(symbol)
+			self.streamPeriods[symbol] = max(period, lastPeriod or 0)
+		if lastPeriod is not None and period > lastPeriod:
+			self.closedQueue.put(symbol)
+	
+	def subscribeStream(self):
+		symbols = self.getSymbolTable()
+		obsolete = self.getObsoleteSymbols()
+		if self.universe.version == self.streamVersion:
+			return
+		self.streamVersion = self.universe.version
+		
+		removed = list(self.streamSymbols - set(symbols) - self.universe.obsoleteSet)
+		if removed:
+			self.feed.unsubscribe(removed, self.baseCandle)
+			with self.streamLock:
+				for symbol in removed:
+					self.streamSymbols.discard(symbol)
+					self.streamPeriods.pop(symbol, None)
+		
+		newSymbols = [s for s in list(symbols) + obsolete if s not in self.streamSymbols]
+		if not newSymbols:
+			return
+		
+		# Seed windows over REST, the stream only keeps them current
+		self.fetchCandles(newSymbols)
+		with self.streamLock:
+			self.streamSymbols.update(newSymbols)
+		self.feed.subscribe(newSymbols, self.baseCandle, self.onStreamCandle)
+	
+	def tradeStreamSymbol(self, symbol):
+		candles = self.candleCache.window(symbol, self.longFrame)
+		if candles is None:
+			return
+		
+		order = None
+		symbols = self.getSymbolTable()
+		if symbol in symbols:
+			order = self.decideSymbol(symbols[symbol], self.getStatus(candles))
+		elif symbol in self.universe.obsoleteSet:
+			order = self.decideObsolete(symbol, self.getStatus(candles))
+		
+		self.markDecision()
+		if order is not None:
+			self.executeOrders([order])
+			if self.monitor is not None:
+				self.watchHeld(symbols, self.universe.obsolete)
+	
+	def streamLoop(self):
+		self._l.info("Trading on stream!")
+		self.interval = self.timeToSec(self.gblConf("shortCandle"))
+		self.closedQueue = queue.Queue()
+		self.streamPeriods = {}
+		self.streamSymbols = set()
+		self.streamLock = threading.Lock() # streamSymbols/streamPeriods, shared with the feed thread
+		self.streamVersion = None
+		
+		self.subscribeStream()
+		self.feed.start()
+		if self.monitor is not None:
+			self.watchHeld(self.getSymbolTable(), self.getObsoleteSymbols())
+		lastCheck = 0
+		while True:
+			try:
+				symbol = self.closedQueue.get(timeout=self.interval + self.settleOffset)
+			except queue.Empty:
+				# Feed silent for a whole candle, fall back to polling
+				self._l.warning("No stream events, polling over REST...")
+				self.metrics.inc("restFallbacks")
+				self.tradeCycle()
+				continue
+			
+			# Queued before the symbol was unsubscribed
+			period = self.streamPeriods.get(symbol)
+			if period is None:
+				continue
+			
+			self.profiler.tick()
+			with self.metrics.span("streamDecide"):
+				self.tradeStreamSymbol(symbol)
+			with self.metrics.span("persist"):
+				self.persist()
+			self.metrics.inc("streamEvents")
 			
-			# Exit symbols not in list
-			symbols = self.stor.getObsoleteSymbols(cache=True)
-			for symbol in symbols:
-				# Data
-				candles = self.getCandles(symbol)
-				sDir, sOpen, sPrice = self.getCandleStatus(candles)
-				if self.verbose:
-					self._l.info("{}: Dir={}, Open={}, Close={}".format(symbol, sDir, sOpen, sPrice))
+			# Pick up symbol list changes once per period
+			if period > lastCheck:
+				lastCheck = period
+				self.subscribeStream()
+	
+	def tradeLoop(self, maxCycles=None):
+		if self.feed is not None:
+			return self.streamLoop()
+		
+		self._l.info("Trading!")
+		interval = self.interval = self.timeToSec(self.gblConf("shortCandle")) # 5min/1min?
+		self.scheduler = CycleScheduler(interval, self.settleOffset, self.clock)
 
-				# Logic
-				if self.hasSymbolEntry(self.coin(symbol)):
-					entryChange = sPrice / self.getSymbolEntry(self.coin(symbol)) - 1.0
-					if sDir > 0 and entryChange > self.tradeFee * 2.0:
-						self._l.info(" ** Selling obsolete...")
-						res = self.sell(symbol, sPrice) # Sell ALL
-						self.discord.notify(res["msg"], icon=":yellow_circle:")
+		# First cycle right away, then on every candle close
+		self.scheduler.begin()
+		while maxCycles is None or self.scheduler.cycles < maxCycles:
+			self.profiler.tick()
+			self.lastCycle = self.clock.time()
+			self.tradeCycle()
+			
+			duration = self.scheduler.finish()
+			self.metrics.inc("cycles")
+			self.metrics.observe("cycle", duration)
+			self.metrics.observe("late", max(self.scheduler.lastLate, 0.0))
+			if duration > interval:
+				self.metrics.inc("overruns")
+				self._l.warning("Cycle overran: {:.3f}s (interval {}s)".format(duration, interval))
+			elif self.verbose:
+				self._l.info("Cycle started {:.3f}s late, ran {:.3f}s".format(self.scheduler.lastLate, duration))
 			
-			if self.verbose:
-				self._l.info("-----")
\ No newline at end of file
+			self.scheduler.wait()
@@ -0,0 +1,78 @@
+import os
+import json
+import time
+import logging
+
+class BalanceJournal():
+	# Append only balance/entry changes, compacted into a storage snapshot every so often
+	def __init__(self, stor, path="balance.journal", snapshotRecords=500, snapshotSecs=900, onSnapshot=None, clock=time):
+		self._l = logging.getLogger("Journal")
+		self.stor = stor
+		self.onSnapshot = onSnapshot
+		self.path = path
+		self.snapshotRecords = snapshotRecords
+		self.snapshotSecs = snapshotSecs
+		self.clock = clock
+
+		if os.path.dirname(path):
+			os.makedirs(os.path.dirname(path), exist_ok=True)
+		self.file = open(path, "a")
+		self.records = 0
+		self.dirty = False
+		self.lastSnapshot = self.clock.monotonic()
+
+	def record(self, balances, entries):
+		# Absolute values only, so replaying twice is harmless
+		balances = {symbol: float(value) for symbol, value in balances.items()}
+		entries = {symbol: float(value) for symbol, value in entries.items()}
+		line = json.dumps({"t": self.clock.time(), "b": balances, "e": entries})
+		self.file.write(line + "\n")
+		self.records += 1
+		self.dirty = True
+
+		if self.records >= self.snapshotRecords or self.clock.monotonic() - self.lastSnapshot >= self.snapshotSecs:
+			self.snapshot()
+
+	def sync(self):
+		# One fsync for every record since the last call
+		if not self.dirty:
+			return
+		self.file.flush()
+		os.fsync(self.file.fileno())
+		self.dirty = False
+
+	def snapshot(self):
+		self.stor.saveBalance()
+		if self.onSnapshot is not None:
+			self.onSnapshot() # Anything restored later replays this journal on top
+
+		self.file.seek(0)
+		self.file.truncate()
+		self.file.flush()
+		os.fsync(self.file.fileno())
+		self.records = 0
+		self.dirty = False
+		self.lastSnapshot = self.clock.monotonic()
+
+	def replay(self):
+		count = 0
+		with open(self.path) as f:
+			for line in f:
+				try:
+					record = json.loads(line)
+				except ValueError:
+					self._l.warning("Skipping torn journal record")
+					break
+
+				for symbol, value in record["b"].items():
+					self.stor.setBalance(symbol, value)
+				for symbol, value in record["e"].items():
+					self.stor.setEntry(symbol, value)
+				count += 1
+
+		self.records = count
+		return count
+
+	def close(self):
+		self.sync()
+		self.file.close()
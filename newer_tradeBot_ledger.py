@@ -0,0 +1,129 @@
+import threading
+
+from .newer_tradeBot_portfolio import Portfolio
+
+class Ledger():
+	# Single owner of balances/entries, safe to share between order workers.
+	# Reads come from the portfolio arrays, writes also go through to storage.
+	def __init__(self, stor, journal):
+		self.stor = stor
+		self.journal = journal
+		self.lock = threading.RLock()
+		self.portfolio = Portfolio()
+		self.owned = {} # owner -> {assetId: reserved}, so a dead shard's reservations can be dropped
+
+	def load(self, assets=()):
+		# Pull restored storage state into the portfolio
+		with self.lock:
+			for asset in list(self.stor.getBalances()) + list(assets):
+				assetId = self.portfolio.assetId(asset)
+				self.portfolio.balance[assetId] = self.stor.getBalance(asset)
+				self.portfolio.setEntry(assetId, self.stor.getEntry(asset) or 0.0)
+
+	def assetId(self, asset):
+		with self.lock:
+			return self.portfolio.assetId(asset)
+
+	def getBalance(self, asset):
+		return float(self.portfolio.balance[self.assetId(asset)])
+
+	def getEntry(self, asset):
+		return self.entryById(self.assetId(asset))
+
+	def hasEntry(self, asset):
+		return self.hasEntryById(self.assetId(asset))
+
+	def entryById(self, assetId):
+		return float(self.portfolio.entry[assetId])
+
+	def hasEntryById(self, assetId):
+		return self.portfolio.hasEntry(assetId)
+
+	def available(self, asset):
+		with self.lock:
+			assetId = self.portfolio.assetId(asset)
+			return float(self.portfolio.balance[assetId] - self.portfolio.reserved[assetId])
+
+	def reserve(self, asset, amount, owner=None):
+		with self.lock:
+			if self.available(asset) < amount:
+				return False
+			assetId = self.portfolio.assetId(asset)
+			self.portfolio.reserved[assetId] += amount
+			if owner is not None:
+				owned = self.owned.setdefault(owner, {})
+				owned[assetId] = owned.get(assetId, 0.0) + amount
+			return True
+
+	def release(self, asset, amount, owner=None):
+		with self.lock:
+			assetId = self.portfolio.assetId(asset)
+			if owner is not None:
+				owned = self.owned.get(owner, {})
+				if assetId not in owned:
+					return # Already dropped by releaseOwner
+				amount = min(amount, owned[assetId])
+				owned[assetId] -= amount
+				if owned[assetId] <= 0.0:
+					del owned[assetId]
+			self.portfolio.reserved[assetId] = max(self.portfolio.reserved[assetId] - amount, 0.0)
+
+	def releaseOwner(self, owner):
+		# Everything an owner still holds, for when it died mid-order
+		with self.lock:
+			owned = self.owned.pop(owner, {})
+			for assetId, amount in owned.items():
+				self.portfolio.reserved[assetId] = max(self.portfolio.reserved[assetId] - amount, 0.0)
+			return len(owned)
+
+	def apply(self, symbolList, valueList, entry, setAbsolute=False):
+		with self.lock:
+			coinId = self.portfolio.assetId(symbolList[0])
+			fiatId = self.portfolio.assetId(symbolList[1])
+			if setAbsolute:
+				self.portfolio.balance[coinId] = valueList[0]
+				if valueList[1] is not None: # Left for a later balance refresh
+					self.portfolio.balance[fiatId] = valueList[1]
+			else:
+				self.portfolio.balance[coinId] += valueList[0]
+				self.portfolio.balance[fiatId] += valueList[1]
+			self.portfolio.setEntry(coinId, entry)
+
+			coinBlc = float(self.portfolio.balance[coinId])
+			fiatBlc = float(self.portfolio.balance[fiatId])
+			self.stor.setBalance(symbolList[0], coinBlc)
+			self.stor.setBalance(symbolList[1], fiatBlc)
+			self.stor.setEntry(symbolList[0], entry)
+			self.journal.record({symbolList[0]: coinBlc, symbolList[1]: fiatBlc}, {symbolList[0]: entry})
+
+		return coinBlc, fiatBlc
+
+	def setBalance(self, asset, value):
+		# Exchange reconcile, only journaled when it actually changes something
+		with self.lock:
+			assetId = self.portfolio.assetId(asset)
+			if self.portfolio.balance[assetId] == value:
+				return False
+			self.portfolio.balance[assetId] = value
+			self.stor.setBalance(asset, value)
+			self.journal.record({asset: value}, {})
+			return True
+
+	def restore(self, assets, data):
+		# Snapshot state back into the portfolio and storage, nothing is reserved after a restart
+		with self.lock:
+			self.portfolio.restore(assets, data)
+			self.portfolio.reserved[:] = 0.0
+			self.owned.clear()
+			for asset in self.portfolio.assets:
+				assetId = self.portfolio.assetId(asset)
+				self.stor.setBalance(asset, float(self.portfolio.balance[assetId]))
+				self.stor.setEntry(asset, float(self.portfolio.entry[assetId]))
+
+	def snapshot(self):
+		with self.lock:
+			return self.portfolio.snapshot()
+
+	def sync(self):
+		with self.lock:
+			self.journal.sync()
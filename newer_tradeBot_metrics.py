@@ -0,0 +1,165 @@
+import os
+import json
+import time
+import bisect
+import logging
+import functools
+import threading
+from contextlib import contextmanager
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+class Histogram():
+	__slots__ = ("counts", "count", "sum", "max")
+
+	def __init__(self):
+		self.counts = [0] * (len(BUCKETS) + 1)
+		self.count = 0
+		self.sum = 0.0
+		self.max = 0.0
+
+	def observe(self, value):
+		self.counts[bisect.bisect_left(BUCKETS, value)] += 1
+		self.count += 1
+		self.sum += value
+		if value > self.max:
+			self.max = value
+
+	def quantile(self, q):
+		# Upper bound of the bucket holding the q-th observation
+		rank = q * self.count
+		total = 0
+		for i, count in enumerate(self.counts):
+			total += count
+			if total >= rank and count:
+				return BUCKETS[i] if i < len(BUCKETS) else self.max
+		return 0.0
+
+	def info(self):
+		return {
+			"count": self.count,
+			"sum": self.sum,
+			"max": self.max,
+			"p50": self.quantile(0.5),
+			"p99": self.quantile(0.99),
+			"buckets": dict(zip([str(b) for b in BUCKETS] + ["+Inf"], self.counts))
+		}
+
+class Metrics():
+	def __init__(self):
+		self._l = logging.getLogger("Metrics")
+		self.lock = threading.Lock()
+		self.histograms = {}
+		self.counters = {}
+		self.sources = {}
+		self.server = None
+
+	@contextmanager
+	def span(self, stage):
+		start = time.perf_counter()
+		try:
+			yield
+		finally:
+			self.observe(stage, time.perf_counter() - start)
+
+	def observe(self, stage, seconds):
+		with self.lock:
+			hist = self.histograms.get(stage)
+			if hist is None:
+				hist = self.histograms[stage] = Histogram()
+			hist.observe(seconds)
+
+	def inc(self, name, value=1):
+		with self.lock:
+			self.counters[name] = self.counters.get(name, 0) + value
+
+	def addSource(self, name, fn):
+		# Extra stats pulled at export time, fn() -> {key: number}
+		self.sources[name] = fn
+
+	def snapshot(self):
+		with self.lock:
+			data = {
+				"time": time.time(),
+				"counters": dict(self.counters),
+				"stages": {stage: hist.info() for stage, hist in self.histograms.items()}
+			}
+		for name, fn in self.sources.items():
+			data[name] = fn()
+		return data
+
+	def prometheus(self):
+		lines = []
+		with self.lock:
+			for name, value in sorted(self.counters.items()):
+				lines.append("trader_{}_total {}".format(name, value))
+
+			for stage, hist in sorted(self.histograms.items()):
+				total = 0
+				for bound, count in zip([str(b) for b in BUCKETS] + ["+Inf"], hist.counts):
+					total += count
+					lines.append('trader_stage_seconds_bucket{{stage="{}",le="{}"}} {}'.format(stage, bound, total))
+				lines.append('trader_stage_seconds_sum{{stage="{}"}} {}'.format(stage, hist.sum))
+				lines.append('trader_stage_seconds_count{{stage="{}"}} {}'.format(stage, hist.count))
+
+		for name, fn in sorted(self.sources.items()):
+			for key, value in sorted(fn().items()):
+				lines.append("trader_{}_{} {}".format(name, key, value))
+
+		return "\n".join(lines) + "\n"
+
+	def flush(self, path):
+		tmpPath = path + ".tmp"
+		with open(tmpPath, "w") as f:
+			json.dump(self.snapshot(), f, indent=1)
+		os.replace(tmpPath, path)
+
+	def flushEvery(self, path, interval=10.0):
+		def run():
+			while True:
+				time.sleep(interval)
+				try:
+					self.flush(path)
+				except OSError as e:
+					self._l.warning("Metrics flush failed: {}".format(e))
+
+		threading.Thread(target=run, name="metricsFlush", daemon=True).start()
+
+	def serve(self, port, host="127.0.0.1"):
+		self.server = ThreadingHTTPServer((host, port), MetricsHandler)
+		self.server.metrics = self
+		threading.Thread(target=self.server.serve_forever, name="metrics", daemon=True).start()
+		self._l.info("Metrics on http://{}:{}/metrics".format(host, self.server.server_address[1]))
+		return self.server.server_address[1]
+
+class MetricsHandler(BaseHTTPRequestHandler):
+	def do_GET(self):
+		metrics = self.server.metrics
+		if self.path == "/metrics":
+			body, contentType = metrics.prometheus(), "text/plain; version=0.0.4"
+		elif self.path == "/metrics.json":
+			body, contentType = json.dumps(metrics.snapshot()), "application/json"
+		else:
+			self.send_error(404)
+			return
+
+		body = body.encode()
+		self.send_response(200)
+		self.send_header("Content-Type", contentType)
+		self.send_header("Content-Length", str(len(body)))
+		self.end_headers()
+		self.wfile.write(body)
+
+	def log_message(self, format, *args):
+		pass
+
+def timed(stage):
+	# Method decorator, records into self.metrics
+	def wrap(fn):
+		@functools.wraps(fn)
+		def inner(self, *args, **kwargs):
+			with self.metrics.span(stage):
+				return fn(self, *args, **kwargs)
+		return inner
+	return wrap
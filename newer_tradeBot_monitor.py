@@ -0,0 +1,41 @@
+import logging
+import threading
+
+class ExitMonitor():
+	# Forming candle ticks for held symbols only, check(symbol, open, price) runs on every one
+	def __init__(self, feed, timeframe, check):
+		self._l = logging.getLogger("Monitor")
+		self.feed = feed
+		self.timeframe = timeframe
+		self.check = check
+		self.watched = set()
+		self.lock = threading.Lock()
+		self.started = False
+
+	def watch(self, symbols):
+		# Keep the feed subscribed to exactly this set
+		symbols = set(symbols)
+		with self.lock:
+			added = symbols - self.watched
+			removed = self.watched - symbols
+			self.watched = symbols
+
+		if removed:
+			self.feed.unsubscribe(removed, self.timeframe)
+		if added:
+			self.feed.subscribe(added, self.timeframe, self.onCandle)
+		if not self.started:
+			self.started = True
+			self.feed.start()
+
+	def onCandle(self, symbol, openTime, row, closed, eventTime):
+		if symbol not in self.watched:
+			return
+		try:
+			self.check(symbol, row[0], row[3])
+		except Exception as e:
+			self._l.error("Exit check failed for {}: {}".format(symbol, e))
+
+	def stop(self):
+		if self.started:
+			self.feed.stop()
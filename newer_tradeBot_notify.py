@@ -0,0 +1,148 @@
+import time
+import queue
+import logging
+import threading
+from concurrent.futures import Future
+
+DROPS_ROOM = 40
+
+def inlineIcon(item):
+	_, msg, icon = item
+	return msg if icon is None else "{} {}".format(icon, msg)
+
+class NotifyQueue():
+	# Same notify() as DiscordBot, but sent from a worker so trading never waits on chat
+	# bot can also be a Future still logging in
+	def __init__(self, bot, maxSize=200, window=1.0, minInterval=1.0, maxRetries=5, maxLength=2000, clock=time):
+		self._l = logging.getLogger("Notify")
+		self.bot = bot
+		self.window = window
+		self.minInterval = minInterval
+		self.maxRetries = maxRetries
+		self.maxLength = maxLength # Webhook message size limit
+		self.clock = clock
+
+		self.queue = queue.Queue(maxsize=maxSize)
+		self.counters = {"queued": 0, "sent": 0, "messages": 0, "dropped": 0, "failed": 0}
+		self.pendingDrops = 0
+		self.lock = threading.Lock() # counters and pendingDrops, notify() runs on any thread
+		self.lastSend = 0.0
+		self.lastLatency = 0.0
+		self.maxLatency = 0.0
+
+		self.thread = threading.Thread(target=self.run, name="notify", daemon=True)
+		self.thread.start()
+
+	def notify(self, msg, icon=None):
+		try:
+			self.queue.put_nowait((self.clock.monotonic(), msg, icon))
+			with self.lock:
+				self.counters["queued"] += 1
+		except queue.Full:
+			with self.lock:
+				self.counters["dropped"] += 1
+				self.pendingDrops += 1
+
+	def depth(self):
+		return self.queue.qsize()
+
+	def stats(self):
+		with self.lock:
+			stats = dict(self.counters)
+		stats.update({"depth": self.depth(), "lastLatency": self.lastLatency, "maxLatency": self.maxLatency})
+		return stats
+
+	def close(self, timeout=5.0):
+		self.queue.put(None)
+		self.thread.join(timeout)
+
+	def run(self):
+		# Bot may still be logging in
+		if isinstance(self.bot, Future):
+			try:
+				self.bot = self.bot.result()
+			except Exception as e:
+				self._l.error("Notify bot failed to start ({}), notifications disabled".format(e))
+				return
+
+		running = True
+		while running:
+			item = self.queue.get()
+			if item is None:
+				break
+
+			# Collect the rest of the burst into the same message
+			batch = [item]
+			deadline = self.clock.monotonic() + self.window
+			while True:
+				remaining = deadline - self.clock.monotonic()
+				if remaining <= 0:
+					break
+				try:
+					item = self.queue.get(timeout=remaining)
+				except queue.Empty:
+					break
+				if item is None:
+					running = False
+					break
+				batch.append(item)
+
+			for chunk in self.split(batch):
+				self.send(chunk)
+
+	def split(self, batch):
+		# Consecutive runs that fit in one message, with room for the drops note
+		limit = self.maxLength - DROPS_ROOM
+		chunks = [[]]
+		size = 0
+		for item in batch:
+			length = len(inlineIcon(item)) + 1
+			if chunks[-1] and size + length > limit:
+				chunks.append([])
+				size = 0
+			chunks[-1].append(item)
+			size += length
+		return chunks
+
+	def send(self, batch):
+		if len(batch) == 1:
+			msg, icon = batch[0][1:]
+		else:
+			msg = "\n".join(inlineIcon(item) for item in batch)
+			icon = None
+		msg = msg[:self.maxLength - DROPS_ROOM] # A single oversized message
+
+		with self.lock:
+			drops, self.pendingDrops = self.pendingDrops, 0
+		if drops:
+			msg += "\n(+{} notifications dropped)".format(drops)
+
+		# Webhook rate limit
+		wait = self.lastSend + self.minInterval - self.clock.monotonic()
+		if wait > 0:
+			self.clock.sleep(wait)
+
+		delay = self.minInterval
+		for attempt in range(self.maxRetries):
+			try:
+				if icon is None:
+					self.bot.notify(msg)
+				else:
+					self.bot.notify(msg, icon=icon)
+				break
+			except Exception as e:
+				self._l.warning("Notify failed ({}), retrying in {}s".format(e, delay))
+				self.clock.sleep(delay)
+				delay *= 2
+		else:
+			with self.lock:
+				self.counters["failed"] += len(batch)
+			self.lastSend = self.clock.monotonic()
+			return
+
+		self.lastSend = self.clock.monotonic()
+		self.lastLatency = self.lastSend - batch[0][0]
+		self.maxLatency = max(self.maxLatency, self.lastLatency)
+		with self.lock:
+			self.counters["sent"] += 1
+			self.counters["messages"] += len(batch)
@@ -0,0 +1,82 @@
+import numpy as np
+
+PORTFOLIO_DTYPE = np.dtype([("balance", "f8"), ("entry", "f8"), ("reserved", "f8"), ("flags", "u1")])
+HAS_ENTRY = 1
+
+class Portfolio():
+	# One record per asset in a single structured array, assets mapped to ids once
+	def __init__(self, capacity=64):
+		self.ids = {}
+		self.assets = []
+		self.data = np.zeros(capacity, dtype=PORTFOLIO_DTYPE)
+		self.bindColumns()
+
+	def bindColumns(self):
+		self.balance = self.data["balance"]
+		self.entry = self.data["entry"]
+		self.reserved = self.data["reserved"]
+		self.flags = self.data["flags"]
+
+	def __len__(self):
+		return len(self.assets)
+
+	def assetId(self, asset):
+		assetId = self.ids.get(asset)
+		if assetId is not None:
+			return assetId
+
+		assetId = len(self.assets)
+		if assetId >= len(self.data):
+			data = np.zeros(len(self.data) * 2, dtype=PORTFOLIO_DTYPE)
+			data[:assetId] = self.data[:assetId]
+			self.data = data
+			self.bindColumns()
+
+		self.ids[asset] = assetId
+		self.assets.append(asset)
+		return assetId
+
+	def setEntry(self, assetId, entry):
+		self.entry[assetId] = entry
+		if entry != 0.0:
+			self.flags[assetId] |= HAS_ENTRY
+		else:
+			self.flags[assetId] &= 0xFF ^ HAS_ENTRY
+
+	def hasEntry(self, assetId):
+		return bool(self.flags[assetId] & HAS_ENTRY)
+
+	def snapshot(self):
+		# Whole portfolio in one buffer copy
+		return list(self.assets), self.data[:len(self.assets)].copy()
+
+	def restore(self, assets, data):
+		self.ids = {}
+		self.assets = []
+		self.data = np.zeros(max(len(assets) * 2, 64), dtype=PORTFOLIO_DTYPE)
+		self.bindColumns()
+		for asset in assets:
+			self.assetId(asset)
+		self.data[:len(assets)] = data
+
+class PortfolioView():
+	# Read-only copy of entries from one snapshot, same reads as Ledger without a round trip each
+	def __init__(self, assets, data):
+		self.ids = {asset: assetId for assetId, asset in enumerate(assets)}
+		self.entry = data["entry"]
+		self.flags = data["flags"]
+
+	def hasEntryById(self, assetId):
+		# Assets added after the snapshot have no entry yet
+		return assetId < len(self.flags) and bool(self.flags[assetId] & HAS_ENTRY)
+
+	def entryById(self, assetId):
+		return float(self.entry[assetId])
+
+	def hasEntry(self, asset):
+		assetId = self.ids.get(asset)
+		return assetId is not None and self.hasEntryById(assetId)
+
+	def getEntry(self, asset):
+		assetId = self.ids.get(asset)
+		return 0.0 if assetId is None else self.entryById(assetId)
@@ -0,0 +1,89 @@
+import os
+import re
+import sys
+import time
+import signal
+import logging
+import threading
+from datetime import datetime
+
+def collapseStack(frame):
+	names = []
+	while frame is not None:
+		code = frame.f_code
+		names.append("{}:{}".format(os.path.basename(code.co_filename), code.co_name))
+		frame = frame.f_back
+	return ";".join(reversed(names))
+
+class SamplingProfiler():
+	# Samples every thread's stack for a few cycles when asked, nothing runs until then.
+	# Output is collapsed stacks (flamegraph.pl / speedscope), one file per capture.
+	def __init__(self, outDir="logs", interval=0.005):
+		self._l = logging.getLogger("Profiler")
+		self.outDir = outDir
+		self.interval = interval
+		self.requested = 0
+		self.remaining = 0
+		self.thread = None
+		self.running = False
+		self.counts = {}
+		self.samples = 0
+
+	def request(self, cycles=10):
+		# Only sets a flag, safe from a signal handler
+		self.requested = cycles
+
+	def installSignal(self, cycles=10, signum=getattr(signal, "SIGUSR1", None)):
+		# kill -USR1 <pid> captures the next cycles
+		if signum is None or threading.current_thread() is not threading.main_thread():
+			return False
+		signal.signal(signum, lambda *args: self.request(cycles))
+		return True
+
+	def tick(self):
+		# Once per cycle, a single check while idle
+		if self.requested:
+			cycles, self.requested = self.requested, 0
+			if self.thread is None:
+				self.start(cycles)
+		elif self.thread is not None:
+			self.remaining -= 1
+			if self.remaining <= 0:
+				self.stop()
+
+	def start(self, cycles):
+		self._l.info("Profiling the next {} cycles...".format(cycles))
+		self.remaining = cycles
+		self.counts = {}
+		self.samples = 0
+		self.running = True
+		self.thread = threading.Thread(target=self.run, name="profiler", daemon=True)
+		self.thread.start()
+
+	def run(self):
+		own = threading.get_ident()
+		while self.running:
+			names = {thread.ident: re.sub(r"_\d+$", "", thread.name) for thread in threading.enumerate()}
+			for ident, frame in sys._current_frames().items():
+				if ident == own:
+					continue
+				stack = "{};{}".format(names.get(ident, ident), collapseStack(frame))
+				self.counts[stack] = self.counts.get(stack, 0) + 1
+			self.samples += 1
+			time.sleep(self.interval)
+
+	def stop(self):
+		self.running = False
+		self.thread.join()
+		self.thread = None
+		return self.write()
+
+	def write(self):
+		os.makedirs(self.outDir, exist_ok=True)
+		path = os.path.join(self.outDir, "profile_{}.folded".format(datetime.now().strftime("%Y-%m-%d_%H%M%S")))
+		with open(path, "w") as f:
+			for stack, count in sorted(self.counts.items(), key=lambda item: -item[1]):
+				f.write("{} {}\n".format(stack, count))
+
+		self._l.info("Wrote {} samples to {}".format(self.samples, path))
+		return path
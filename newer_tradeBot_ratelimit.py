@@ -0,0 +1,124 @@
+import time
+import heapq
+import itertools
+import threading
+from concurrent.futures import Future
+
+# Lower runs first
+ORDER = 0
+ACCOUNT = 1
+MARKET = 2
+
+def candleWeight(maxCandles):
+	# Binance klines request weight by limit
+	if maxCandles < 100:
+		return 1
+	if maxCandles < 500:
+		return 2
+	if maxCandles <= 1000:
+		return 5
+	return 10
+
+class WeightBudget():
+	# Token bucket refilled continuously, waiters served by priority then arrival
+	def __init__(self, weightPerMinute=1200, headroom=0.9, clock=time):
+		self.capacity = weightPerMinute * headroom
+		self.rate = self.capacity / 60.0
+		self.clock = clock
+
+		self.tokens = self.capacity
+		self.lastRefill = self.clock.monotonic()
+		self.cond = threading.Condition()
+		self.waiting = []
+		self.seq = itertools.count()
+		self.used = 0
+		self.waits = 0
+
+	def refill(self):
+		now = self.clock.monotonic()
+		self.tokens = min(self.capacity, self.tokens + (now - self.lastRefill) * self.rate)
+		self.lastRefill = now
+
+	def acquire(self, weight, priority=MARKET):
+		weight = min(weight, self.capacity)
+		with self.cond:
+			entry = (priority, next(self.seq))
+			heapq.heappush(self.waiting, entry)
+			waited = False
+			while True:
+				self.refill()
+				first = self.waiting[0] is entry
+				if first and self.tokens >= weight:
+					heapq.heappop(self.waiting)
+					self.tokens -= weight
+					self.used += weight
+					self.waits += waited
+					self.cond.notify_all()
+					return
+
+				waited = True
+				self.cond.wait((weight - self.tokens) / self.rate if first else 1.0)
+
+class ScheduledTradeApi():
+	# Same surface as api.TradeApi, every call paid for out of one weight budget
+	def __init__(self, trader, weightPerMinute=1200, headroom=0.9, clock=time):
+		self.trader = trader
+		self.budget = WeightBudget(weightPerMinute, headroom, clock)
+		self.lock = threading.Lock()
+		self.inflight = {}
+		self.coalesced = 0
+
+	def __getattr__(self, name):
+		return getattr(self.trader, name)
+
+	def shared(self, key, size, call, weight, priority):
+		# Join an identical (or larger) request already on its way
+		with self.lock:
+			current = self.inflight.get(key)
+			if current is not None and current[0] >= size:
+				self.coalesced += 1
+				return current[1], True
+
+			future = Future()
+			self.inflight[key] = (size, future)
+
+		try:
+			self.budget.acquire(weight, priority)
+			future.set_result(call())
+		except Exception as e:
+			future.set_exception(e)
+		finally:
+			with self.lock:
+				if self.inflight.get(key, (None, None))[1] is future:
+					del self.inflight[key]
+
+		return future, False
+
+	def getCandles(self, symbol, timeframe, maxCandles):
+		call = lambda: self.trader.getCandles(symbol, timeframe, maxCandles)
+		future, joined = self.shared(("candles", symbol, timeframe), maxCandles, call, candleWeight(maxCandles), MARKET)
+		candles = future.result()
+		if joined and candles is not None and len(candles) > maxCandles:
+			return candles.tail(maxCandles)
+		return candles
+
+	def getBalance(self):
+		future, joined = self.shared(("balance",), 0, self.trader.getBalance, 10, ACCOUNT)
+		return future.result()
+
+	def buy(self, symbol, amount):
+		self.budget.acquire(1, ORDER)
+		return self.trader.buy(symbol, amount)
+
+	def sell(self, symbol, amount):
+		self.budget.acquire(1, ORDER)
+		return self.trader.sell(symbol, amount)
+
+	def stats(self):
+		return {
+			"weightUsed": self.budget.used,
+			"weightAvailable": self.budget.tokens,
+			"waiting": len(self.budget.waiting),
+			"waits": self.budget.waits,
+			"coalesced": self.coalesced
+		}
@@ -0,0 +1,43 @@
+import time
+
+class CycleScheduler():
+	def __init__(self, interval, offset=0.5, clock=time):
+		self.interval = interval
+		self.offset = offset
+		self.clock = clock
+
+		self.cycles = 0
+		self.overruns = 0
+		self.cycleStart = None
+		self.lastLate = 0.0
+		self.lastDuration = 0.0
+
+	def nextBoundary(self):
+		# Candle boundaries are wall clock based (exchange time)
+		now = self.clock.time() - self.offset
+		return (now // self.interval + 1) * self.interval + self.offset
+
+	def begin(self):
+		self.cycleStart = self.clock.monotonic()
+		self.lastLate = 0.0
+
+	def wait(self):
+		target = self.nextBoundary()
+
+		# Sleep on the monotonic clock so wall clock adjustments can't stretch it
+		deadline = self.clock.monotonic() + (target - self.clock.time())
+		remaining = deadline - self.clock.monotonic()
+		while remaining > 0:
+			self.clock.sleep(remaining)
+			remaining = deadline - self.clock.monotonic()
+
+		self.cycleStart = self.clock.monotonic()
+		self.lastLate = self.cycleStart - deadline
+		return target
+
+	def finish(self):
+		self.lastDuration = self.clock.monotonic() - self.cycleStart
+		self.cycles += 1
+		if self.lastDuration > self.interval:
+			self.overruns += 1
+		return self.lastDuration
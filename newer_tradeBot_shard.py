@@ -0,0 +1,92 @@
+import os
+import time
+import logging
+import threading
+import multiprocessing
+from multiprocessing.managers import BaseManager
+
+from .newer_tradeBot_core import TradeBot
+
+class LedgerManager(BaseManager):
+	pass
+
+LedgerManager.register("Ledger")
+LedgerManager.register("Notify")
+
+# Coordinator state and endpoints, never handed to the workers
+COORDINATOR_ONLY = ("metricsPort", "metricsFile", "statePath", "journalPath", "discordBot")
+
+def serveLedger(ledger, authkey, address=("127.0.0.1", 0), notify=None):
+	# Serve the coordinator's ledger (and notify queue) to the workers from a background thread
+	class LedgerServer(BaseManager):
+		pass
+
+	LedgerServer.register("Ledger", callable=lambda: ledger)
+	LedgerServer.register("Notify", callable=lambda: notify)
+	server = LedgerServer(address=address, authkey=authkey).get_server()
+	threading.Thread(target=server.serve_forever, name="ledgerServer", daemon=True).start()
+	return server.address
+
+def workerKwargs(botKwargs, index):
+	# Each worker serves its own metrics on the ports after the coordinator's
+	kwargs = {key: value for key, value in botKwargs.items() if key not in COORDINATOR_ONLY}
+	if botKwargs.get("metricsPort") is not None:
+		kwargs["metricsPort"] = botKwargs["metricsPort"] + 1 + index
+	return kwargs
+
+def workerMain(index, count, address, authkey, botKwargs, feedFactory=None, exitFeedFactory=None):
+	manager = LedgerManager(address=address, authkey=authkey)
+	manager.connect()
+
+	# Feeds hold sockets and threads, so every worker builds its own.
+	# Notifications go through the coordinator's single Discord login.
+	bot = TradeBot(
+		shard=(index, count),
+		ledger=manager.Ledger(),
+		discordBot=manager.Notify(),
+		feed=None if feedFactory is None else feedFactory(),
+		exitFeed=None if exitFeedFactory is None else exitFeedFactory(),
+		**botKwargs
+	)
+	bot.tradeLoop()
+
+def runSharded(workers=None, checkEvery=5.0, feedFactory=None, exitFeedFactory=None, **botKwargs):
+	# Coordinator: owns balances/entries, N workers each trade their shard of the symbols.
+	# feedFactory/exitFeedFactory are picklable callables run in each worker, e.g. functools.partial(SocketCandleFeed, host, port)
+	_l = logging.getLogger("Shards")
+	workers = workers or os.cpu_count()
+	authkey = os.urandom(16)
+	for key in ("feed", "exitFeed"):
+		if botKwargs.get(key) is not None:
+			raise ValueError("{0} can't be sent to worker processes, pass {0}Factory instead".format(key))
+
+	coordinator = TradeBot(**botKwargs)
+	address = serveLedger(coordinator.ledger, authkey, notify=coordinator.discord)
+	_l.info("Ledger served on {}:{} for {} workers".format(address[0], address[1], workers))
+
+	ctx = multiprocessing.get_context("spawn")
+	def startWorker(index):
+		proc = ctx.Process(
+			target=workerMain,
+			args=(index, workers, address, authkey, workerKwargs(botKwargs, index), feedFactory, exitFeedFactory),
+			name="trader{}".format(index),
+			daemon=True
+		)
+		proc.start()
+		return proc
+
+	procs = [startWorker(i) for i in range(workers)]
+	try:
+		while True:
+			time.sleep(checkEvery)
+			for i, proc in enumerate(procs):
+				if not proc.is_alive():
+					_l.error("Worker {} exited ({}), restarting...".format(i, proc.exitcode))
+					released = coordinator.ledger.releaseOwner(i)
+					if released:
+						_l.warning("Released {} reservations held by worker {}".format(released, i))
+					procs[i] = startWorker(i)
+	finally:
+		for proc in procs:
+			proc.terminate()
+		coordinator.ledger.sync()
@@ -0,0 +1,53 @@
+import numpy as np
+
+def stackCandles(windows, cols=("open", "close", "volume")):
+	# Right align every window into one (symbols x candles) array, padded with NaN
+	lengths = np.array([len(w["open"]) for w in windows], dtype=int)
+	width = int(lengths.max()) if len(windows) else 0
+
+	stacked = {}
+	for col in cols:
+		arr = np.full((len(windows), width), np.nan)
+		for i, w in enumerate(windows):
+			if lengths[i]:
+				arr[i, width - lengths[i]:] = w[col]
+		stacked[col] = arr
+
+	return stacked, lengths
+
+def candleStatus(opens, closes, lengths):
+	rows = np.arange(len(opens))
+	currPrice = closes[:, -1]
+	cdlDir = np.where(currPrice > opens[:, -1], 1, -1)
+
+	# Newest first, each column compared against the one after it
+	prev = opens[:, ::-1]
+	later = prev[:, :-1]
+	earlier = prev[:, 1:]
+
+	# Extend "open" while previous opens keep going lower (up) or higher (down)
+	extend = np.where(cdlDir[:, None] > 0, ~(earlier >= later), ~(earlier <= later))
+	extend &= np.arange(1, prev.shape[1])[None, :] < lengths[:, None]
+	run = np.logical_and.accumulate(extend, axis=1).sum(axis=1)
+
+	return cdlDir, prev[rows, run], currPrice
+
+def volumeStatus(opens, closes, volumes, bars=2):
+	vols = volumes[:, -bars:]
+	rising = (vols[:, :-1] < vols[:, 1:]).any(axis=1)
+	red = (closes[:, -bars:] < opens[:, -bars:]).any(axis=1)
+
+	return ~rising & ~red
+
+# Decision rules, shared by the live loop and the backtester (scalars or arrays)
+ENTER_MULT = 0.8
+EXIT_MULT = 0.8
+
+def isEntry(sDir, candleChange, avgDown, enterMult=ENTER_MULT):
+	return (sDir < 0) & (candleChange < avgDown * enterMult)
+
+def isExit(sDir, entryChange, avgUp, exitMult=EXIT_MULT):
+	return (sDir > 0) & (entryChange > avgUp * exitMult)
+
+def isStopLoss(sDir, entryChange, avgDown, sellLossMult):
+	return (sDir < 0) & (entryChange < avgDown * sellLossMult)
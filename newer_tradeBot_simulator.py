@@ -0,0 +1,140 @@
+import threading
+import numpy as np
+import pandas as pd
+
+from .newer_tradeBot_archive import openCandles
+
+# Deterministic stand-in for api.TradeApi, driven by a virtual clock
+
+def timeframeSec(strTime):
+	suffixes = {"s": 1, "m": 60, "h": 3600, "d": 86400}
+	if strTime[-1] in suffixes:
+		return int(strTime[:-1]) * suffixes[strTime[-1]]
+	return int(strTime)
+
+class VirtualClock():
+	# time/monotonic/sleep like the time module, sleeping just moves time forward
+	def __init__(self, start=1700000000.0):
+		self.now = float(start)
+		self.lock = threading.Lock()
+
+	def time(self):
+		return self.now
+
+	def monotonic(self):
+		return self.now
+
+	def sleep(self, secs):
+		with self.lock:
+			self.now += max(secs, 0.0)
+
+def archiveSource(archive):
+	# Replay recorded candles, source(symbol, timeframe, firstIdx, count) like syntheticCandles
+	def source(symbol, timeframe, first, count):
+		candles = openCandles(archive.path(symbol, timeframe), first * timeframe * 1000, (first + count) * timeframe * 1000)
+		frame = pd.DataFrame({col: candles[col] for col in ("open", "high", "low", "close", "volume")})
+		frame.insert(0, "time", candles["time"])
+		return frame
+	return source
+
+class SimExchange():
+	def __init__(self, source, clock, balances=None, baseTimeframe="1m", fee=0.001, slippage=0.0005, fillRatio=1.0, blockSize=4096):
+		self.source = source
+		self.blockSize = blockSize
+		self.blocks = {}
+		self.clock = clock
+		self.baseTimeframe = timeframeSec(baseTimeframe)
+		self.fee = fee
+		self.slippage = slippage
+		self.fillRatio = fillRatio
+		self.balances = dict(balances or {})
+		self.lock = threading.Lock()
+		self.orders = []
+
+	def binanceConnect(self):
+		return True
+
+	def baseCandles(self, symbol, first, count):
+		# Source read in large blocks, replay moves forward so most calls are a slice
+		block = self.blocks.get(symbol)
+		if block is None or first < block[0] or first + count > block[0] + block[1]:
+			size = max(count, self.blockSize)
+			frame = self.source(symbol, self.baseTimeframe, first, size)
+			rows = frame[["open", "high", "low", "close", "volume"]].to_numpy(dtype=float)
+			block = self.blocks[symbol] = (first, size, frame["time"].to_numpy(), rows)
+
+		times, rows = block[2], block[3]
+		start, end = np.searchsorted(times, [first * self.baseTimeframe * 1000, (first + count) * self.baseTimeframe * 1000])
+		return times[start:end], rows[start:end].copy()
+
+	def formingCandle(self, row, openTime):
+		# Only the part of the candle that has happened by now
+		elapsed = min(max((self.clock.time() - openTime / 1000.0) / self.baseTimeframe, 0.0), 1.0)
+		price = row[0] + (row[3] - row[0]) * elapsed
+		return [row[0], max(row[0], price), min(row[0], price), price, row[4] * elapsed]
+
+	def getCandles(self, symbol, timeframe, maxCandles):
+		# Higher timeframes are built from the base candles, so both always agree
+		ratio = timeframeSec(timeframe) // self.baseTimeframe
+		last = int(self.clock.time() // self.baseTimeframe)
+		first = (last // ratio - maxCandles + 1) * ratio
+		times, rows = self.baseCandles(symbol, first, last - first + 1)
+		if not len(rows):
+			return pd.DataFrame(columns=["time", "open", "high", "low", "close", "volume"])
+		rows[-1] = self.formingCandle(rows[-1], times[-1])
+
+		buckets = (times // 1000 // self.baseTimeframe) // ratio
+		starts = np.flatnonzero(np.r_[True, buckets[1:] != buckets[:-1]])
+		ends = np.r_[starts[1:], len(rows)] - 1
+		return pd.DataFrame({
+			"time": buckets[starts] * ratio * self.baseTimeframe * 1000,
+			"open": rows[starts, 0],
+			"high": np.maximum.reduceat(rows[:, 1], starts),
+			"low": np.minimum.reduceat(rows[:, 2], starts),
+			"close": rows[ends, 3],
+			"volume": np.add.reduceat(rows[:, 4], starts)
+		})
+
+	def price(self, symbol):
+		last = int(self.clock.time() // self.baseTimeframe)
+		times, rows = self.baseCandles(symbol, last, 1)
+		return self.formingCandle(rows[-1], times[-1])[3] if len(rows) else None
+
+	def getBalance(self):
+		with self.lock:
+			return {"free": dict(self.balances)}
+
+	def order(self, side, symbol, amount):
+		# Market order: slipped price, fillRatio of the amount, fee taken from what is received
+		coin, fiat = symbol.split("/")
+		price = self.price(symbol)
+		if price is None or amount <= 0:
+			return None
+
+		with self.lock:
+			filled = amount * self.fillRatio
+			if side == "buy":
+				price *= 1.0 + self.slippage
+				if self.balances.get(fiat, 0.0) < filled * price:
+					return None
+				self.balances[fiat] -= filled * price
+				self.balances[coin] = self.balances.get(coin, 0.0) + filled * (1.0 - self.fee)
+			else:
+				price *= 1.0 - self.slippage
+				if self.balances.get(coin, 0.0) < filled:
+					return None
+				self.balances[coin] -= filled
+				self.balances[fiat] = self.balances.get(fiat, 0.0) + filled * price * (1.0 - self.fee)
+
+			self.orders.append((self.clock.time(), side, symbol, filled, price))
+			return {
+				coin: {"free": self.balances[coin]},
+				fiat: {"free": self.balances[fiat]},
+				"free": dict(self.balances)
+			}
+
+	def buy(self, symbol, amount):
+		return self.order("buy", symbol, amount)
+
+	def sell(self, symbol, amount):
+		return self.order("sell", symbol, amount)
@@ -0,0 +1,48 @@
+import os
+import zipfile
+import logging
+import numpy as np
+
+# Warm start snapshot: candle windows in one uncompressed .npz, the portfolio next to it.
+# The portfolio is rewritten on every journal compaction, so it is kept small and separate.
+
+def portfolioPath(path):
+	root, ext = os.path.splitext(path)
+	return root + ".portfolio" + (ext or ".npz")
+
+def writeArrays(path, arrays):
+	# Never leave a half written snapshot behind
+	tmpPath = path + ".tmp"
+	with open(tmpPath, "wb") as f:
+		np.savez(f, **arrays)
+		f.flush()
+		os.fsync(f.fileno())
+	os.replace(tmpPath, path)
+
+def savePortfolio(path, ledger):
+	# Under the ledger lock, an older copy must never overwrite one matching a journal truncate
+	with ledger.lock:
+		assets, portfolio = ledger.snapshot()
+		writeArrays(portfolioPath(path), {"assets": np.array(assets, dtype=str), "portfolio": portfolio})
+
+def saveState(path, ledger, cache):
+	writeArrays(path, cache.snapshot())
+	savePortfolio(path, ledger)
+
+def readArrays(path):
+	try:
+		with np.load(path, allow_pickle=False) as f:
+			return {key: f[key] for key in f.files}
+	except (OSError, ValueError, zipfile.BadZipFile) as e:
+		logging.getLogger("State").warning("Ignoring unreadable state {} ({})".format(path, e))
+		return None
+
+def loadState(path):
+	if not path:
+		return None
+
+	state = {}
+	for part in (path, portfolioPath(path)):
+		if os.path.exists(part):
+			state.update(readArrays(part) or {})
+	return state or None
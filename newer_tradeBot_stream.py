@@ -0,0 +1,206 @@
+import abc
+import json
+import time
+import socket
+import logging
+import threading
+import socketserver
+
+def streamName(symbol, timeframe):
+	return "{}@kline_{}".format(symbol.replace("/", "").lower(), timeframe)
+
+def klineMessage(symbol, timeframe, openTime, row, closed=False, eventTime=None):
+	# Same layout as the Binance kline stream payload
+	keys = ("o", "h", "l", "c", "v")
+	kline = {key: str(value) for key, value in zip(keys, row)}
+	kline.update({"t": int(openTime), "i": timeframe, "x": bool(closed)})
+	return {
+		"e": "kline",
+		"E": int(time.time() * 1000) if eventTime is None else int(eventTime),
+		"s": symbol.replace("/", "").upper(),
+		"k": kline
+	}
+
+class CandleFeed(abc.ABC):
+	# Push market data: onCandle(symbol, openTime, row, closed, eventTime)
+	connected = False
+
+	@abc.abstractmethod
+	def subscribe(self, symbols, timeframe, onCandle):
+		pass
+
+	@abc.abstractmethod
+	def unsubscribe(self, symbols, timeframe):
+		pass
+
+	@abc.abstractmethod
+	def start(self):
+		pass
+
+	@abc.abstractmethod
+	def stop(self):
+		pass
+
+class SocketCandleFeed(CandleFeed):
+	# Line delimited JSON kline stream
+	def __init__(self, host="127.0.0.1", port=9443, reconnectDelay=2.0):
+		self._l = logging.getLogger("Feed")
+		self.host = host
+		self.port = port
+		self.reconnectDelay = reconnectDelay
+
+		self.streams = {}
+		self.onCandle = None
+		self.sock = None
+		self.sendLock = threading.RLock() # Also orders stream changes against (re)connects
+		self.running = False
+		self.connected = False
+		self.thread = None
+
+	def send(self, msg):
+		with self.sendLock:
+			if self.sock is not None:
+				self.sock.sendall((json.dumps(msg) + "\n").encode())
+
+	def subscribe(self, symbols, timeframe, onCandle):
+		self.onCandle = onCandle
+		with self.sendLock:
+			names = []
+			for symbol in symbols:
+				name = streamName(symbol, timeframe)
+				if name not in self.streams:
+					self.streams[name] = symbol
+					names.append(name)
+
+			if names and self.connected:
+				self.send({"method": "SUBSCRIBE", "params": names})
+
+	def unsubscribe(self, symbols, timeframe):
+		with self.sendLock:
+			names = [name for name in (streamName(symbol, timeframe) for symbol in symbols) if self.streams.pop(name, None)]
+			if names and self.connected:
+				self.send({"method": "UNSUBSCRIBE", "params": names})
+
+	def start(self):
+		self.running = True
+		self.thread = threading.Thread(target=self.run, name="feed", daemon=True)
+		self.thread.start()
+
+	def stop(self):
+		self.running = False
+		with self.sendLock:
+			if self.sock is not None:
+				try:
+					self.sock.shutdown(socket.SHUT_RDWR)
+				except OSError:
+					pass
+
+	def run(self):
+		while self.running:
+			try:
+				with socket.create_connection((self.host, self.port), timeout=self.reconnectDelay) as sock:
+					sock.settimeout(None)
+					# Anything subscribed from here on is sent on its own
+					with self.sendLock:
+						self.sock = sock
+						self.send({"method": "SUBSCRIBE", "params": list(self.streams)})
+						self.connected = True
+					self._l.info("Feed connected to {}:{}".format(self.host, self.port))
+
+					for line in sock.makefile("r"):
+						self.handle(json.loads(line))
+			except (OSError, ValueError) as e:
+				if self.running:
+					self._l.warning("Feed error: {}".format(e))
+
+			with self.sendLock:
+				self.connected = False
+				self.sock = None
+			if self.running:
+				time.sleep(self.reconnectDelay)
+
+	def handle(self, msg):
+		if msg.get("e") != "kline" or self.onCandle is None:
+			return
+
+		kline = msg["k"]
+		symbol = self.streams.get("{}@kline_{}".format(msg["s"].lower(), kline["i"]))
+		if symbol is None:
+			return
+
+		row = [float(kline[key]) for key in ("o", "h", "l", "c", "v")]
+		self.onCandle(symbol, kline["t"], row, kline["x"], msg["E"])
+
+class FeedHandler(socketserver.StreamRequestHandler):
+	def handle(self):
+		feed = self.server.feed
+		feed.addClient(self)
+		try:
+			for line in self.rfile:
+				msg = json.loads(line)
+				if msg.get("method") == "SUBSCRIBE":
+					feed.addStreams(self, msg["params"])
+				elif msg.get("method") == "UNSUBSCRIBE":
+					feed.removeStreams(self, msg["params"])
+		except (OSError, ValueError):
+			pass
+		finally:
+			feed.removeClient(self)
+
+class LocalFeedServer():
+	# Offline stand-in for the exchange kline stream
+	def __init__(self, host="127.0.0.1", port=0):
+		self.clients = {}
+		self.lock = threading.Condition()
+
+		self.server = socketserver.ThreadingTCPServer((host, port), FeedHandler)
+		self.server.daemon_threads = True
+		self.server.feed = self
+		self.host, self.port = self.server.server_address
+		self.thread = None
+
+	def start(self):
+		self.thread = threading.Thread(target=self.server.serve_forever, name="feedServer", daemon=True)
+		self.thread.start()
+		return self
+
+	def stop(self):
+		self.server.shutdown()
+		self.server.server_close()
+
+	def addClient(self, client):
+		with self.lock:
+			self.clients[client] = set()
+			self.lock.notify_all()
+
+	def removeClient(self, client):
+		with self.lock:
+			self.clients.pop(client, None)
+
+	def addStreams(self, client, names):
+		with self.lock:
+			self.clients[client].update(names)
+			self.lock.notify_all()
+
+	def removeStreams(self, client, names):
+		with self.lock:
+			self.clients[client].difference_update(names)
+			self.lock.notify_all()
+
+	def waitSubscribed(self, symbol, timeframe, timeout=5.0, subscribed=True):
+		name = streamName(symbol, timeframe)
+		with self.lock:
+			return self.lock.wait_for(lambda: any(name in streams for streams in self.clients.values()) == subscribed, timeout)
+
+	def publish(self, symbol, timeframe, openTime, row, closed=False, eventTime=None):
+		name = streamName(symbol, timeframe)
+		data = (json.dumps(klineMessage(symbol, timeframe, openTime, row, closed, eventTime)) + "\n").encode()
+		with self.lock:
+			clients = [client for client, streams in self.clients.items() if name in streams]
+
+		for client in clients:
+			try:
+				client.wfile.write(data)
+				client.wfile.flush()
+			except OSError:
+				self.removeClient(client)
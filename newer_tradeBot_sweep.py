@@ -0,0 +1,70 @@
+import csv
+import itertools
+import numpy as np
+import pandas as pd
+from multiprocessing import Pool
+from multiprocessing.shared_memory import SharedMemory
+
+from .newer_tradeBot_backtest import backtest
+
+# Worker side views of the shared candle arrays
+_shared = {}
+
+def shareArray(values):
+	values = np.ascontiguousarray(values)
+	shm = SharedMemory(create=True, size=max(values.nbytes, 1))
+	np.ndarray(values.shape, values.dtype, buffer=shm.buf)[:] = values
+	return shm, (shm.name, values.shape, values.dtype.str)
+
+def initWorker(specs, fixed):
+	for key, (name, shape, dtype) in specs.items():
+		shm = SharedMemory(name=name)
+		view = np.ndarray(shape, dtype, buffer=shm.buf)
+		view.flags.writeable = False
+		_shared[key] = (shm, view)
+	_shared["fixed"] = fixed
+
+def runParams(params):
+	data = {key: value[1] for key, value in _shared.items() if key != "fixed"}
+	kwargs = dict(_shared["fixed"])
+	kwargs.update(params)
+
+	res = backtest(data["opens"], data["closes"], data["avgUp"], data["avgDown"], **kwargs)
+	return dict(params, **res)
+
+def paramGrid(grid):
+	keys = list(grid)
+	return [dict(zip(keys, values)) for values in itertools.product(*(grid[key] for key in keys))]
+
+def sweep(opens, closes, avgUp, avgDown, grid, fixed, resultsPath="sweep_results.csv", processes=None):
+	# grid: {param: [values]} over backtest() kwargs, fixed: the rest (tradeFee, totalCost...)
+	arrays = {
+		"opens": np.asarray(opens, dtype=float),
+		"closes": np.asarray(closes, dtype=float),
+		"avgUp": np.asarray(avgUp, dtype=float),
+		"avgDown": np.asarray(avgDown, dtype=float)
+	}
+
+	shms = []
+	specs = {}
+	try:
+		for key, values in arrays.items():
+			shm, specs[key] = shareArray(values)
+			shms.append(shm)
+
+		results = []
+		with Pool(processes, initializer=initWorker, initargs=(specs, fixed)) as pool, open(resultsPath, "w", newline="") as f:
+			writer = None
+			for res in pool.imap_unordered(runParams, paramGrid(grid)):
+				if writer is None:
+					writer = csv.DictWriter(f, fieldnames=list(res))
+					writer.writeheader()
+				writer.writerow(res)
+				f.flush()
+				results.append(res)
+	finally:
+		for shm in shms:
+			shm.close()
+			shm.unlink()
+
+	return pd.DataFrame(results)
@@ -0,0 +1,88 @@
+import zlib
+import numpy as np
+
+class SymbolParams():
+	__slots__ = ("symbol", "coin", "fiat", "coinId", "fiatId", "avgUp", "avgDown")
+
+	def __init__(self, symbol, avgUp, avgDown, assetId=None):
+		self.symbol = symbol
+		self.coin, self.fiat = symbol.split("/")
+		self.coinId = None if assetId is None else assetId(self.coin)
+		self.fiatId = None if assetId is None else assetId(self.fiat)
+		self.avgUp = avgUp
+		self.avgDown = avgDown
+
+def symbolShard(symbol, count):
+	# Stable across processes and restarts, unlike hash()
+	return zlib.crc32(symbol.encode()) % count
+
+def frameHash(frame):
+	# Cheap content fingerprint, storage may hand back a new but identical frame
+	if frame is None:
+		return None
+	crc = zlib.crc32("\n".join(frame["symbol"]).encode())
+	crc = zlib.crc32(np.asarray(frame["avgUp"], dtype=float).tobytes(), crc)
+	return zlib.crc32(np.asarray(frame["avgDown"], dtype=float).tobytes(), crc)
+
+class SymbolUniverse():
+	# Active table and obsolete list, only rows that actually changed are touched
+	def __init__(self, owns=None):
+		self.owns = owns
+		self.table = {}
+		self.rows = {}
+		self.obsolete = []
+		self.obsoleteSet = set()
+		self.frame = None
+		self.frameHash = None
+		self.obsoleteSource = None
+		self.obsoleteRows = []
+		self.version = 0
+		self.added = []
+		self.updated = []
+		self.removed = []
+
+	def update(self, frame, obsolete, assetId=None):
+		# True when the universe changed, added/updated/removed then hold the difference
+		tableChanged = frame is not self.frame and frameHash(frame) != self.frameHash
+		obsoleteChanged = obsolete is not self.obsoleteSource and list(obsolete or ()) != self.obsoleteRows
+		self.frame = frame
+		self.obsoleteSource = obsolete
+		if not tableChanged and not obsoleteChanged:
+			return False
+
+		before = set(self.table) | self.obsoleteSet
+		self.added = []
+		self.updated = []
+		if tableChanged:
+			self.frameHash = frameHash(frame)
+			self.updateTable(frame, assetId)
+		if obsoleteChanged:
+			self.obsoleteRows = list(obsolete or ())
+			self.obsolete = [symbol for symbol in self.obsoleteRows if self.owns is None or self.owns(symbol)]
+			self.obsoleteSet = set(self.obsolete)
+
+		self.removed = list(before - set(self.table) - self.obsoleteSet)
+		self.version += 1
+		return True
+
+	def updateTable(self, frame, assetId):
+		rows = {}
+		if frame is not None:
+			for symbol, avgUp, avgDown in zip(frame["symbol"], frame["avgUp"], frame["avgDown"]):
+				if symbol not in rows and (self.owns is None or self.owns(symbol)):
+					rows[symbol] = (float(avgUp), float(avgDown)) # First row wins
+
+		for symbol in [symbol for symbol in self.table if symbol not in rows]:
+			del self.table[symbol]
+			del self.rows[symbol]
+
+		# Params may have been moved on since (online analysis), only new storage values replace them
+		for symbol, values in rows.items():
+			params = self.table.get(symbol)
+			if params is None:
+				self.table[symbol] = SymbolParams(symbol, values[0], values[1], assetId)
+				self.added.append(symbol)
+			elif values != self.rows[symbol]:
+				params.avgUp, params.avgDown = values
+				self.updated.append(symbol)
+		self.rows = rows
@@ -0,0 +1,23 @@
+import os
+import sys
+import types
+import pytest
+
+# The modules use package-relative imports; mount the repo root as a "tradebot" package.
+# api, storage and discord are deployment modules, the tests always pass the bench fakes instead.
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+if "tradebot" not in sys.modules:
+	package = types.ModuleType("tradebot")
+	package.__path__ = [ROOT]
+	sys.modules["tradebot"] = package
+	for name in ("api", "storage", "discord"):
+		module = types.ModuleType("tradebot." + name)
+		sys.modules[module.__name__] = module
+		setattr(package, name, module)
+
+@pytest.fixture(autouse=True)
+def workDir(tmp_path, monkeypatch):
+	# Journal, state and profile files default to the cwd
+	monkeypatch.chdir(tmp_path)
+	return tmp_path
@@ -0,0 +1,68 @@
+import numpy as np
+import pytest
+
+from tradebot.newer_tradeBot_bench import makeBot
+from tradebot.newer_tradeBot_backtest import backtest, candleStatusSeries
+from tradebot.newer_tradeBot_signals import isEntry, isExit, isStopLoss
+
+WINDOW = 20
+FEE, COST, SELL_LOSS_MULT = 0.001, 100.0, 2.0
+
+@pytest.fixture(scope="module")
+def bot(tmp_path_factory):
+	return makeBot(1, journalDir=str(tmp_path_factory.mktemp("bot")), statePath=None)
+
+def market(seed, count=6, length=400):
+	# Prices rounded to 0.1 so equal opens are common
+	rng = np.random.default_rng(seed)
+	opens = np.round(100 + np.cumsum(rng.normal(0, 0.5, (count, length)), axis=1), 1)
+	closes = np.round(opens + rng.normal(0, 0.5, (count, length)), 1)
+	return opens, closes, rng.uniform(0.002, 0.01, count), -rng.uniform(0.002, 0.01, count)
+
+def windowAt(opens, closes, t):
+	first = max(0, t - WINDOW + 1)
+	return {"open": opens[first:t + 1], "close": closes[first:t + 1]}
+
+def naiveReplay(bot, opens, closes, avgUp, avgDown):
+	# One getCandleStatus per symbol and candle, sells before buys in symbol order
+	fiat, held, trades = 1000.0, {}, 0
+	for t in range(opens.shape[1]):
+		sells, buys = [], []
+		for i in range(len(opens)):
+			sDir, sOpen, sPrice = bot.getCandleStatus(windowAt(opens[i], closes[i], t))
+			if i in held:
+				entryChange = sPrice / held[i][0] - 1
+				if isExit(sDir, entryChange, avgUp[i]) or isStopLoss(sDir, entryChange, avgDown[i], SELL_LOSS_MULT):
+					sells.append((i, sPrice))
+			elif isEntry(sDir, sPrice / sOpen - 1, avgDown[i]):
+				buys.append((i, sPrice))
+
+		for i, price in sells:
+			fiat += held.pop(i)[1] * price / (1 + FEE)
+			trades += 1
+		for i, price in buys:
+			if fiat >= COST:
+				held[i] = (price, COST / price / (1 + FEE))
+				fiat -= COST
+				trades += 1
+	return fiat, trades, len(held)
+
+@pytest.mark.parametrize("seed", range(6))
+def test_statusSeriesMatchesWindows(bot, seed):
+	opens, closes = market(seed)[:2]
+	cdlDir, sOpen, sPrice = candleStatusSeries(opens, closes, WINDOW)
+	for i in range(len(opens)):
+		for t in range(opens.shape[1]):
+			assert (cdlDir[i, t], sOpen[i, t], sPrice[i, t]) == bot.getCandleStatus(windowAt(opens[i], closes[i], t)), (i, t)
+
+@pytest.mark.parametrize("seed", range(6))
+def test_backtestMatchesNaiveReplay(bot, seed):
+	opens, closes, avgUp, avgDown = market(seed)
+	fiat, trades, held = naiveReplay(bot, opens, closes, avgUp, avgDown)
+
+	result = backtest(opens, closes, avgUp, avgDown, FEE, COST, SELL_LOSS_MULT, window=WINDOW)
+	assert result["fiat"] == pytest.approx(fiat)
+	assert (result["trades"], result["openPositions"]) == (trades, held)
+
+	# Chunk boundaries don't change anything
+	assert backtest(opens, closes, avgUp, avgDown, FEE, COST, SELL_LOSS_MULT, window=WINDOW, chunk=97) == result
@@ -0,0 +1,152 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from tradebot.newer_tradeBot_candles import CandleCache, COLUMNS
+
+TF = 60
+RATIO = 5
+
+class Clock():
+	def __init__(self):
+		self.now = 0.0
+
+	def time(self):
+		return self.now
+
+class Market():
+	# Random closed base candles plus the forming one, with both REST timeframes built by brute force
+	def __init__(self, seed, count=1200):
+		rng = np.random.default_rng(seed)
+		self.rows = rng.uniform(90, 110, size=(count, 5))
+		self.rows[:, 4] = rng.uniform(1, 10, count)
+		self.rows[:, 1] = self.rows[:, :4].max(axis=1)
+		self.rows[:, 2] = self.rows[:, :4].min(axis=1)
+		self.clock = Clock()
+		self.forming = None
+
+	def moveTo(self, idx):
+		# Halfway through candle idx
+		self.clock.now = idx * TF + TF / 2
+		row = self.rows[idx].copy()
+		row[3] = (row[0] + row[3]) / 2
+		row[1] = max(row[0], row[3])
+		row[2] = min(row[0], row[3])
+		row[4] *= 0.5
+		self.forming = row
+
+	def base(self):
+		idx = int(self.clock.time() // TF)
+		rows = self.rows[:idx + 1].copy()
+		rows[-1] = self.forming
+		return rows
+
+	def aggregated(self):
+		rows = self.base()
+		return np.array([
+			[bucket[0, 0], bucket[:, 1].max(), bucket[:, 2].min(), bucket[-1, 3], bucket[:, 4].sum()]
+			for bucket in (rows[i:i + RATIO] for i in range(0, len(rows), RATIO))
+		])
+
+	def frame(self, rows, timeframe, count):
+		frame = pd.DataFrame(rows[-count:], columns=COLUMNS)
+		frame.insert(0, "time", (np.arange(len(rows))[-count:] * timeframe * 1000).astype(np.int64))
+		return frame
+
+	def fetchBase(self, symbol, count):
+		return self.frame(self.base(), TF, count)
+
+	def fetchAggregated(self, symbol, count):
+		return self.frame(self.aggregated(), TF * RATIO, count)
+
+def windowRows(window):
+	return np.column_stack([window[col] for col in COLUMNS])
+
+@pytest.mark.parametrize("seed", range(3))
+def test_aggregatedMatchesBruteForce(seed):
+	market = Market(seed)
+	rng = np.random.default_rng(seed + 100)
+	cache = CandleCache(market.fetchBase, TF, size=50, clock=market.clock)
+	cache.addTimeframe(TF * RATIO, market.fetchAggregated, 20)
+
+	idx = 200
+	checked = 0
+	while idx < 1100:
+		# Mostly the next candle, sometimes a jump past several
+		idx += 1 if rng.integers(0, 30) else int(rng.integers(2, 60))
+		market.moveTo(idx)
+		if rng.integers(0, 10) < 6:
+			window = cache.get("X", TF * RATIO)
+		else:
+			cache.push("X", (idx - 1) * TF * 1000, market.rows[idx - 1])
+			cache.push("X", idx * TF * 1000, market.forming)
+			window = cache.window("X", TF * RATIO)
+			if window is None:
+				assert cache.stale("X") or ("X", TF * RATIO) not in cache.aggregators
+				continue
+
+		truth = market.aggregated()[-len(window["open"]):]
+		np.testing.assert_allclose(windowRows(window), truth, err_msg="candle {}".format(idx))
+		checked += 1
+
+	assert checked > 400
+
+def test_pushGapMarksStale():
+	market = Market(0)
+	market.moveTo(100)
+	cache = CandleCache(market.fetchBase, TF, size=50, clock=market.clock)
+	cache.get("X")
+	assert not cache.stale("X")
+
+	# Candle 101 never arrives
+	assert not cache.push("X", 102 * TF * 1000, market.rows[102])
+	assert cache.stale("X")
+	assert cache.window("X") is None
+
+	market.moveTo(102)
+	cache.get("X")
+	assert not cache.stale("X")
+	np.testing.assert_allclose(windowRows(cache.window("X")), market.base()[-50:])
+
+def test_pushOlderCandleIgnored():
+	market = Market(0)
+	market.moveTo(100)
+	cache = CandleCache(market.fetchBase, TF, size=50, clock=market.clock)
+	cache.get("X")
+
+	assert not cache.push("X", 99 * TF * 1000, market.rows[99])
+	assert not cache.stale("X")
+
+class SkewedClock():
+	# Local clock, a candle boundary ahead of the exchange while skew is set
+	def __init__(self, clock):
+		self.clock = clock
+		self.skew = 0
+
+	def time(self):
+		return self.clock.time() + self.skew
+
+def test_updateMatchesOnOpenTime():
+	# Flat pair, every open equal, so only the open time tells candles apart
+	market = Market(0)
+	market.rows[:, 0] = 100.0
+	market.rows[:, 1] = np.maximum(market.rows[:, 1], 100.0)
+	market.rows[:, 2] = np.minimum(market.rows[:, 2], 100.0)
+	clock = SkewedClock(market.clock)
+	cache = CandleCache(market.fetchBase, TF, size=50, clock=clock)
+
+	fetched = []
+	fetchBase = market.fetchBase
+	def countingFetch(symbol, count):
+		fetched.append(count)
+		return fetchBase(symbol, count)
+	cache.fetch = countingFetch
+
+	for idx in range(100, 110):
+		market.moveTo(idx)
+		clock.skew = TF if idx % 3 == 1 else 0
+		window = cache.get("X")
+		np.testing.assert_allclose(windowRows(window), market.base()[-50:], err_msg="candle {}".format(idx))
+
+	# Skew or not, one full load and then incremental fetches only
+	assert fetched.count(50) == 1
@@ -0,0 +1,27 @@
+from tradebot.newer_tradeBot_bench import makeBot
+
+class CountingLedger():
+	# Stands in for the shard workers' ledger proxy, where every call is a round trip
+	def __init__(self, ledger):
+		self.ledger = ledger
+		self.calls = {}
+
+	def __getattr__(self, name):
+		attr = getattr(self.ledger, name)
+		if not callable(attr):
+			return attr
+		def call(*args, **kwargs):
+			self.calls[name] = self.calls.get(name, 0) + 1
+			return attr(*args, **kwargs)
+		return call
+
+def test_cycleReadsOneSnapshot(workDir):
+	bot = makeBot(40, journalDir=str(workDir), statePath=None)
+	for i in range(0, 40, 4):
+		bot.ledger.apply(["C{}".format(i), "USDT"], [0.1, -10.0], 100.0)
+	ledger = bot.ledger = CountingLedger(bot.ledger)
+
+	bot.tradeCycle()
+
+	assert not {"hasEntry", "hasEntryById", "getEntry", "entryById"} & set(ledger.calls)
+	assert ledger.calls["snapshot"] <= 1 + 3 # Once, and again after each batch that placed orders
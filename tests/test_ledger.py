@@ -0,0 +1,37 @@
+from tradebot.newer_tradeBot_bench import FakeStorage
+from tradebot.newer_tradeBot_ledger import Ledger
+
+def makeLedger(usdt=100.0):
+	stor = FakeStorage(["C0/USDT"])
+	stor.setBalance("USDT", usdt)
+	ledger = Ledger(stor, None)
+	ledger.load(["USDT"])
+	return ledger
+
+def test_reserveRelease():
+	ledger = makeLedger()
+	assert ledger.reserve("USDT", 60.0)
+	assert not ledger.reserve("USDT", 60.0)
+	ledger.release("USDT", 60.0)
+	assert ledger.available("USDT") == 100.0
+
+def test_releaseOwner():
+	# A worker died holding reservations, the rest stay held
+	ledger = makeLedger()
+	assert ledger.reserve("USDT", 30.0, 0)
+	assert ledger.reserve("USDT", 20.0, 0)
+	assert ledger.reserve("USDT", 10.0, 1)
+	assert ledger.reserve("USDT", 5.0)
+	assert ledger.available("USDT") == 35.0
+
+	assert ledger.releaseOwner(0) == 1
+	assert ledger.available("USDT") == 85.0
+	assert ledger.releaseOwner(0) == 0
+
+	# A late release from the dead worker can't free someone else's reservation
+	ledger.release("USDT", 30.0, 0)
+	assert ledger.available("USDT") == 85.0
+
+	ledger.release("USDT", 10.0, 1)
+	ledger.release("USDT", 5.0)
+	assert ledger.available("USDT") == 100.0
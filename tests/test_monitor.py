@@ -0,0 +1,51 @@
+import time
+import pytest
+
+from tradebot.newer_tradeBot_bench import makeBot
+from tradebot.newer_tradeBot_stream import LocalFeedServer, SocketCandleFeed
+from tradebot.newer_tradeBot_simulator import VirtualClock
+
+HELD = "C3/USDT"
+
+@pytest.fixture
+def monitorBot(workDir):
+	server = LocalFeedServer().start()
+	feed = SocketCandleFeed(server.host, server.port, reconnectDelay=0.1)
+	bot = makeBot(5, journalDir=str(workDir), statePath=None, exitFeed=feed, clock=VirtualClock(1700000000))
+
+	# Hold one coin, entered at the current price
+	price = float(bot.getCandles(HELD)["close"][-1])
+	bot.updateBalance(["C3", "USDT"], [0.1, -10.0], price)
+	bot.watchHeld(bot.getSymbolTable(), bot.getObsoleteSymbols())
+	assert server.waitSubscribed(HELD, "1m")
+	yield bot, server, price
+	bot.monitor.stop()
+	server.stop()
+
+def waitExit(bot, coin, timeout=5.0):
+	deadline = time.monotonic() + timeout
+	while bot.ledger.hasEntry(coin) and time.monotonic() < deadline:
+		time.sleep(0.02)
+	return not bot.ledger.hasEntry(coin)
+
+def test_monitorWatchesHeldOnly(monitorBot):
+	bot, server, price = monitorBot
+	assert bot.monitor.watched == {HELD}
+	assert not server.waitSubscribed("C1/USDT", "1m", timeout=0.1)
+
+def test_monitorExitsOnTick(monitorBot):
+	bot, server, price = monitorBot
+	requests = bot.trader.requests
+
+	# A small move keeps the position, a +10% candle takes the exit
+	server.publish(HELD, "1m", 0, [price, price, price, price * 1.0001, 1.0])
+	assert not waitExit(bot, "C3", timeout=0.3)
+	server.publish(HELD, "1m", 0, [price, price * 1.1, price, price * 1.1, 1.0])
+	assert waitExit(bot, "C3")
+
+	assert bot.metrics.counters["monitorExits"] == 1
+	assert bot.trader.requests == requests # Decided on the tick alone
+
+	bot.watchHeld(bot.getSymbolTable(), bot.getObsoleteSymbols())
+	assert server.waitSubscribed(HELD, "1m", subscribed=False)
+	assert bot.monitor.watched == set()
@@ -0,0 +1,109 @@
+import threading
+from concurrent.futures import Future
+
+from tradebot.newer_tradeBot_bench import FakeDiscordBot
+from tradebot.newer_tradeBot_notify import NotifyQueue
+from tradebot.newer_tradeBot_simulator import VirtualClock
+
+class FlakyBot(FakeDiscordBot):
+	# Fails the first calls, like a webhook answering 429
+	def __init__(self, failures):
+		super().__init__(keep=True)
+		self.failures = failures
+
+	def notify(self, msg, icon=None):
+		if self.failures:
+			self.failures -= 1
+			raise IOError("rate limited")
+		super().notify(msg, icon)
+
+def pendingQueue(bot, **kwargs):
+	# Everything is queued while the bot is still logging in, then flushed together
+	login = Future()
+	notifyQueue = NotifyQueue(login, window=0.05, clock=VirtualClock(), **kwargs)
+	return notifyQueue, lambda: login.set_result(bot)
+
+def test_burstCoalesced():
+	bot = FakeDiscordBot(keep=True)
+	notifyQueue, login = pendingQueue(bot)
+	notifyQueue.notify("first", icon=":a:")
+	notifyQueue.notify("second")
+	notifyQueue.notify("third", icon=":b:")
+	login()
+	notifyQueue.close()
+
+	assert bot.messages == [(None, ":a: first\nsecond\n:b: third")]
+	stats = notifyQueue.stats()
+	assert (stats["queued"], stats["sent"], stats["messages"]) == (3, 1, 3)
+
+def test_singleKeepsIcon():
+	bot = FakeDiscordBot(keep=True)
+	notifyQueue, login = pendingQueue(bot)
+	notifyQueue.notify("alone", icon=":a:")
+	login()
+	notifyQueue.close()
+
+	assert bot.messages == [(":a:", "alone")]
+
+def test_dropsReported():
+	bot = FakeDiscordBot(keep=True)
+	notifyQueue, login = pendingQueue(bot, maxSize=2)
+	for i in range(5):
+		notifyQueue.notify("msg {}".format(i))
+	login()
+	notifyQueue.close()
+
+	assert bot.messages == [(None, "msg 0\nmsg 1\n(+3 notifications dropped)")]
+	assert notifyQueue.stats()["dropped"] == 3
+
+def test_concurrentCounts():
+	notifyQueue, login = pendingQueue(FakeDiscordBot(), maxSize=50)
+	threads = [threading.Thread(target=lambda: [notifyQueue.notify("x") for i in range(100)]) for t in range(8)]
+	for thread in threads:
+		thread.start()
+	for thread in threads:
+		thread.join()
+
+	stats = notifyQueue.stats()
+	assert (stats["queued"], stats["dropped"]) == (50, 750)
+	assert notifyQueue.pendingDrops == 750
+	login()
+	notifyQueue.close()
+
+def test_burstSplitAtMaxLength():
+	bot = FakeDiscordBot(keep=True)
+	notifyQueue, login = pendingQueue(bot, maxLength=100)
+	lines = ["line {:02d} ".format(i) + "x" * 20 for i in range(20)]
+	for line in lines:
+		notifyQueue.notify(line)
+	notifyQueue.notify("y" * 500)
+	login()
+	notifyQueue.close()
+
+	assert len(bot.messages) > 1
+	assert all(len(msg) <= 100 for icon, msg in bot.messages)
+	assert "\n".join(msg for icon, msg in bot.messages[:-1]).split("\n") == lines
+	assert notifyQueue.stats()["messages"] == 21
+
+def test_retryBackoff():
+	bot = FlakyBot(2)
+	notifyQueue, login = pendingQueue(bot, minInterval=1.0)
+	start = notifyQueue.clock.monotonic()
+	notifyQueue.notify("hello")
+	login()
+	notifyQueue.close()
+
+	assert bot.messages == [(None, "hello")]
+	assert notifyQueue.clock.monotonic() - start == 1.0 + 2.0
+	assert notifyQueue.stats()["failed"] == 0
+
+def test_retriesExhausted():
+	bot = FlakyBot(10)
+	notifyQueue, login = pendingQueue(bot, maxRetries=3)
+	notifyQueue.notify("a")
+	notifyQueue.notify("b")
+	login()
+	notifyQueue.close()
+
+	assert bot.messages == []
+	assert notifyQueue.stats()["failed"] == 2
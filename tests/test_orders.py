@@ -0,0 +1,66 @@
+import time
+import threading
+
+from tradebot.newer_tradeBot_bench import makeBot, FakeTradeApi
+
+class ReorderingExchange(FakeTradeApi):
+	# Fills in call order, but the first order's response arrives last
+	def __init__(self, balances, delays):
+		super().__init__(balances=balances)
+		self.delays = list(delays)
+		self.lock = threading.Lock()
+
+	def buy(self, symbol, amount):
+		coin, fiat = symbol.split("/")
+		with self.lock:
+			self.balances[fiat] -= 10.0
+			self.balances[coin] = self.balances.get(coin, 0.0) + amount
+			snapshot = {coin: {"free": self.balances[coin]}, fiat: {"free": self.balances[fiat]}}
+			delay = self.delays.pop(0)
+		time.sleep(delay)
+		return snapshot
+
+def buyOrder(symbol):
+	return {"symbol": symbol, "side": "buy", "price": 100.0, "log": "Buy " + symbol, "icon": None}
+
+def test_concurrentFillsKeepNewestFiat(workDir):
+	bot = makeBot(3, journalDir=str(workDir), statePath=None, testMode=False)
+	exchange = bot.trader.trader = ReorderingExchange(bot.trader.getBalance()["free"], [0.2, 0.0, 0.0])
+	assert bot.ledger.getBalance("USDT") == 30.0
+
+	results = bot.executeOrders([buyOrder("C0/USDT"), buyOrder("C1/USDT")])
+
+	assert all(res["success"] for res in results)
+	assert exchange.balances["USDT"] == 10.0
+	assert bot.ledger.getBalance("USDT") == 10.0
+	assert bot.ledger.getBalance("C0") == exchange.balances["C0"]
+	assert bot.ledger.getBalance("C1") == exchange.balances["C1"]
+	assert bot.ledger.getEntry("C0") == 100.0
+
+def test_refreshFailureKeepsLowestFiat(workDir):
+	bot = makeBot(3, journalDir=str(workDir), statePath=None, testMode=False)
+	exchange = bot.trader.trader = ReorderingExchange(bot.trader.getBalance()["free"], [0.2, 0.0, 0.0])
+	def failBalance():
+		raise IOError("timeout")
+	exchange.getBalance = failBalance
+
+	bot.executeOrders([buyOrder("C0/USDT"), buyOrder("C1/USDT")])
+
+	assert bot.ledger.getBalance("USDT") == 10.0
+
+def test_fiatHeldUntilRefresh(workDir):
+	bot = makeBot(3, journalDir=str(workDir), statePath=None, testMode=False)
+	exchange = bot.trader.trader = ReorderingExchange(bot.trader.getBalance()["free"], [0.2, 0.0, 0.0])
+
+	# What another reserver could take just before the refresh
+	available = []
+	syncFiat = bot.syncFiat
+	def checkedSync(fiats, snapshots):
+		available.append(bot.ledger.available("USDT"))
+		syncFiat(fiats, snapshots)
+	bot.syncFiat = checkedSync
+
+	bot.executeOrders([buyOrder("C0/USDT"), buyOrder("C1/USDT")])
+
+	assert available[0] <= exchange.balances["USDT"]
+	assert bot.ledger.available("USDT") == 10.0
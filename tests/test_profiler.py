@@ -0,0 +1,21 @@
+import signal
+import pytest
+
+from tradebot.newer_tradeBot_bench import makeBot
+
+pytestmark = pytest.mark.skipif(not hasattr(signal, "SIGUSR1"), reason="no SIGUSR1")
+
+@pytest.fixture
+def usr1():
+	previous = signal.signal(signal.SIGUSR1, signal.SIG_DFL)
+	yield
+	signal.signal(signal.SIGUSR1, previous)
+
+def test_signalLeftAlone(usr1, workDir):
+	makeBot(1, journalDir=str(workDir))
+	assert signal.getsignal(signal.SIGUSR1) == signal.SIG_DFL
+
+def test_signalOptIn(usr1, workDir):
+	bot = makeBot(1, journalDir=str(workDir), profileSignal=True, profileCycles=3)
+	signal.raise_signal(signal.SIGUSR1)
+	assert bot.profiler.requested == 3
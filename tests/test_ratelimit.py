@@ -0,0 +1,7 @@
+import pytest
+
+from tradebot.newer_tradeBot_ratelimit import candleWeight
+
+@pytest.mark.parametrize("limit, weight", [(1, 1), (99, 1), (100, 2), (499, 2), (500, 5), (1000, 5), (1001, 10), (1500, 10)])
+def test_candleWeight(limit, weight):
+	assert candleWeight(limit) == weight
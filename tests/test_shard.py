@@ -0,0 +1,14 @@
+import pytest
+
+from tradebot.newer_tradeBot_shard import workerKwargs, runSharded
+
+def test_workerKwargs():
+	botKwargs = {"testMode": True, "metricsPort": 9100, "metricsFile": "m.json", "statePath": "s.npz", "journalPath": "b.journal", "discordBot": object(), "orderWorkers": 4}
+	assert workerKwargs(botKwargs, 0) == {"testMode": True, "metricsPort": 9101, "orderWorkers": 4}
+	assert workerKwargs(botKwargs, 2)["metricsPort"] == 9103
+	assert "metricsPort" not in workerKwargs({"testMode": True}, 0)
+
+@pytest.mark.parametrize("key", ["feed", "exitFeed"])
+def test_liveFeedRejected(key):
+	with pytest.raises(ValueError, match=key + "Factory"):
+		runSharded(workers=1, **{key: object()})
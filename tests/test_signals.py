@@ -0,0 +1,43 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from tradebot.newer_tradeBot_bench import makeBot
+
+def randomCandles(rng, length):
+	# Prices on a coarse grid so equal opens and volumes (ties) are common
+	opens = rng.integers(95, 105, length).astype(float)
+	closes = opens + rng.integers(-2, 3, length)
+	return pd.DataFrame({
+		"open": opens,
+		"close": closes,
+		"volume": rng.integers(1, 4, length).astype(float)
+	})
+
+@pytest.fixture
+def bot(workDir):
+	return makeBot(1, journalDir=str(workDir), statePath=None)
+
+@pytest.mark.parametrize("seed", range(5))
+def test_batchMatchesScalar(bot, seed):
+	rng = np.random.default_rng(seed)
+	candles = {"S{}".format(i): randomCandles(rng, int(rng.integers(2, 40))) for i in range(50)}
+
+	batch = bot.getBatchStatus(candles)
+
+	assert list(batch) == list(candles)
+	for symbol, frame in candles.items():
+		assert batch[symbol] == bot.getStatus(frame), symbol
+
+def test_batchFlatRun(bot):
+	# The open search must stop on equal opens, in both directions
+	frame = pd.DataFrame({"open": [100.0, 100.0, 100.0], "close": [100.0, 100.0, 101.0], "volume": [1.0, 1.0, 1.0]})
+	falling = pd.DataFrame({"open": [100.0, 101.0, 101.0, 102.0], "close": [100.0, 101.0, 101.0, 101.0], "volume": [3.0, 2.0, 1.0, 1.0]})
+
+	batch = bot.getBatchStatus({"up": frame, "down": falling})
+
+	assert batch["up"] == bot.getStatus(frame) == (1, 100.0, 101.0, True)
+	assert batch["down"] == bot.getStatus(falling)
+
+def test_batchEmpty(bot):
+	assert bot.getBatchStatus({}) == {}
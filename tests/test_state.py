@@ -0,0 +1,37 @@
+import os
+
+from tradebot.newer_tradeBot_bench import makeBot
+from tradebot.newer_tradeBot_state import portfolioPath
+
+def balances(bot, assets):
+	return {asset: (bot.ledger.getBalance(asset), bot.ledger.getEntry(asset)) for asset in assets}
+
+def test_compactionWritesPortfolioOnly(workDir):
+	statePath = str(workDir / "state.npz")
+	bot = makeBot(5, journalDir=str(workDir), statePath=statePath)
+
+	# Startup compacted the journal: portfolio saved, no windows yet
+	assert os.path.exists(portfolioPath(statePath))
+	assert not os.path.exists(statePath)
+
+	bot.tradeCycle()
+	bot.persistState(force=True)
+	assert os.path.exists(statePath)
+
+def test_warmRestore(workDir):
+	statePath = str(workDir / "state.npz")
+	first = makeBot(20, journalDir=str(workDir), statePath=statePath)
+	first.tradeCycle()
+	first.persistState(force=True)
+
+	# Compacted after the windows were saved, then journaled only
+	first.updateBalance(["C1", "USDT"], [3.0, -7.0], 1.5)
+	with first.ledger.lock:
+		first.journal.snapshot()
+	first.updateBalance(["C2", "USDT"], [1.0, -2.0], 2.5)
+	first.ledger.sync()
+	expected = balances(first, first.ledger.portfolio.assets)
+
+	second = makeBot(20, journalDir=str(workDir), statePath=statePath, resetBalance=False)
+	assert balances(second, expected) == expected
+	assert len(second.candleCache.buffers) == 20
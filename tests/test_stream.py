@@ -0,0 +1,103 @@
+import time
+import queue
+import threading
+import pytest
+
+from tradebot.newer_tradeBot_bench import makeBot
+from tradebot.newer_tradeBot_stream import CandleFeed, LocalFeedServer, SocketCandleFeed
+from tradebot.newer_tradeBot_simulator import VirtualClock
+
+SYMBOL = "C0/USDT"
+
+@pytest.fixture
+def streamBot(workDir):
+	clock = VirtualClock(1700000000 // 60 * 60)
+	server = LocalFeedServer().start()
+	feed = SocketCandleFeed(server.host, server.port, reconnectDelay=0.1)
+	bot = makeBot(2, journalDir=str(workDir), statePath=None, feed=feed, clock=clock)
+
+	# Every decision with the closes it was made on
+	decisions = queue.Queue()
+	tradeStreamSymbol = bot.tradeStreamSymbol
+	def recordDecision(symbol):
+		window = bot.candleCache.window(symbol, bot.longFrame)
+		decisions.put((symbol, None if window is None else window["close"].copy()))
+		tradeStreamSymbol(symbol)
+	bot.tradeStreamSymbol = recordDecision
+
+	loop = threading.Thread(target=bot.tradeLoop, daemon=True)
+	loop.start()
+	assert server.waitSubscribed(SYMBOL, "1m")
+	yield bot, server, clock, decisions, loop
+	feed.stop()
+	server.stop()
+
+def openTime(clock, offset=0):
+	return (int(clock.time() // 60) + offset) * 60000
+
+def test_streamGapReseeds(streamBot):
+	bot, server, clock, decisions, loop = streamBot
+	row = [100.0, 101.0, 99.0, 100.5, 1.0]
+	server.publish(SYMBOL, "1m", openTime(clock), row, eventTime=openTime(clock) + 1000)
+
+	# The next candle's events never arrive
+	clock.sleep(120)
+	row = [123.0, 125.0, 122.0, 124.0, 2.0]
+	server.publish(SYMBOL, "1m", openTime(clock), row, eventTime=openTime(clock) + 1000)
+
+	symbol, closes = decisions.get(timeout=5)
+	assert symbol == SYMBOL
+	assert closes is not None and closes[-1] == 124.0
+	assert len(closes) == bot.candleCache.size
+	assert bot.metrics.counters["streamGaps"] == 1
+
+def test_removedSymbolUnsubscribed(streamBot):
+	bot, server, clock, decisions, loop = streamBot
+	removed = "C1/USDT"
+	assert server.waitSubscribed(removed, "1m")
+	row = [100.0, 101.0, 99.0, 100.5, 1.0]
+	for symbol in (SYMBOL, removed):
+		server.publish(symbol, "1m", openTime(clock), row, eventTime=openTime(clock) + 1000)
+
+	# Dropped from storage, noticed on the next decision while its own event is still queued
+	bot.stor.symbols = bot.stor.symbols[bot.stor.symbols["symbol"] != removed]
+	clock.sleep(60)
+	for symbol in (SYMBOL, removed):
+		server.publish(symbol, "1m", openTime(clock), row, eventTime=openTime(clock) + 1000)
+	assert decisions.get(timeout=5)[0] == SYMBOL
+	assert server.waitSubscribed(removed, "1m", subscribed=False)
+
+	clock.sleep(60)
+	server.publish(SYMBOL, "1m", openTime(clock), row, eventTime=openTime(clock) + 1000)
+	server.publish(removed, "1m", openTime(clock), row, eventTime=openTime(clock) + 1000)
+	assert decisions.get(timeout=5)[0] == SYMBOL
+	assert decisions.empty()
+	assert loop.is_alive()
+	assert removed not in bot.streamPeriods
+
+def test_subscribeWhileConnecting():
+	server = LocalFeedServer().start()
+	feed = SocketCandleFeed(server.host, server.port, reconnectDelay=0.1)
+
+	# Hold the connect's own SUBSCRIBE so a subscribe() lands while it is in flight
+	connecting = threading.Event()
+	send = feed.send
+	def slowSend(msg):
+		if not connecting.is_set():
+			connecting.set()
+			time.sleep(0.2)
+		send(msg)
+	feed.send = slowSend
+
+	try:
+		feed.start()
+		assert connecting.wait(5)
+		feed.subscribe([SYMBOL], "1m", lambda *args: None)
+		assert server.waitSubscribed(SYMBOL, "1m", timeout=2)
+	finally:
+		feed.stop()
+		server.stop()
+
+def test_candleFeedAbstract():
+	with pytest.raises(TypeError):
+		CandleFeed()